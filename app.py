@@ -1,34 +1,170 @@
 # app.py — CatClube (Flask + SQLAlchemy)
 import os
+import io
+import re
 import csv
+import json
+import time
+import bisect
+import random
+import hashlib
+import logging
+import uuid
+import signal
+import threading
+import unicodedata
 import datetime as dt
+import click
+from collections import namedtuple, OrderedDict
 
 from flask import (
-    Flask, render_template, request, redirect, url_for, flash, session, g, jsonify
+    Flask, Blueprint, render_template, request, redirect, url_for, flash, session, g,
+    jsonify, current_app, has_request_context, stream_with_context,
 )
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import or_, func
-from sqlalchemy.orm import joinedload
-from werkzeug.security import generate_password_hash, check_password_hash
-from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from flask_sqlalchemy.session import Session as FlaskSQLAlchemySession
+from markupsafe import Markup
+from sqlalchemy import (
+    or_, func, tuple_, text, event, select, update, inspect, literal, literal_column, table,
+    column, bindparam,
+)
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import CreateIndex
+from werkzeug.security import (
+    generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+)
+from itsdangerous import (
+    URLSafeSerializer, URLSafeTimedSerializer, BadSignature, SignatureExpired
+)
+
+# Módulos carregados só por create_app() (_load_optional_modules), não na
+# importação: compressão (brotli é opcional; sem ele, só gzip), sqlite3 e o
+# cache de bytecode do Jinja.
+brotli = zlib = sqlite3 = FileSystemBytecodeCache = None
+
+def _load_optional_modules():
+    global brotli, zlib, sqlite3, FileSystemBytecodeCache
+    import zlib
+    import sqlite3
+    from jinja2 import FileSystemBytecodeCache
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
 
 # ------------------------------------------------------------------------------
 # Configuração básica
 # ------------------------------------------------------------------------------
+# Valores padrão lidos do ambiente; create_app(config) pode sobrescrever
+# qualquer chave, inclusive as SQLALCHEMY_*, antes de os engines existirem.
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 DB_PATH = os.path.join(BASE_DIR, "catclube.db")
 
-app = Flask(__name__)
-app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev-secret-catclube")
-app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv(
-    "DATABASE_URL",
-    f"sqlite:///{DB_PATH}"
-)
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+# Templates compilados ficam em disco (bytecode do Jinja): um processo novo só
+# lê o .cache em vez de analisar e compilar cada template de novo. A chave
+# inclui o checksum do fonte, então editar um template invalida a entrada.
+# JINJA_CACHE_DIR vazio desliga.
+JINJA_CACHE_DIR = os.getenv("JINJA_CACHE_DIR", os.path.join(BASE_DIR, "instance", "jinja-cache"))
+
+def _default_config():
+    config = {
+        "SECRET_KEY": os.getenv("SECRET_KEY", "dev-secret-catclube"),
+        "SQLALCHEMY_DATABASE_URI": os.getenv("DATABASE_URL", f"sqlite:///{DB_PATH}"),
+        "SQLALCHEMY_TRACK_MODIFICATIONS": False,
+        "JINJA_CACHE_DIR": JINJA_CACHE_DIR,
+    }
+    if REPLICA_URL:
+        config["SQLALCHEMY_BINDS"] = {"replica": REPLICA_URL}
+    return config
+
+def _jinja_bytecode_cache(directory):
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    return FileSystemBytecodeCache(directory)
+
+# ------------------------------------------------------------------------------
+# Perfil do engine: pool de conexões e PRAGMAs do SQLite
+# ------------------------------------------------------------------------------
+# Com vários workers do gunicorn no mesmo arquivo, o modo WAL deixa leitores e
+# o escritor trabalharem em paralelo, e o busy_timeout faz um escritor esperar
+# a vez em vez de falhar com "database is locked". As PRAGMAs valem por
+# conexão, por isso são aplicadas no evento "connect" de cada conexão nova
+# (create_app registra o listener nos engines SQLite).
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "10000"))
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+    "foreign_keys": "ON" if os.getenv("SQLITE_FOREIGN_KEYS", "1") == "1" else "OFF",
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", "32768")),  # negativo = KiB
+    "temp_store": "MEMORY",
+}
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+def _engine_options(uri):
+    if not uri.startswith("sqlite"):
+        return {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW,
+                "pool_timeout": DB_POOL_TIMEOUT, "pool_pre_ping": True}
+    if uri in ("sqlite://", "sqlite:///:memory:"):
+        return {}  # banco em memória: o pool padrão mantém uma única conexão
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "connect_args": {
+            "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000,
+            "check_same_thread": False,  # conexões do pool passam entre threads
+        },
+    }
+
+def _sqlite_pragmas(dbapi_conn, connection_record):
+    cur = dbapi_conn.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cur.execute(f"PRAGMA {name}={value}")
+    cur.close()
 # Se for usar no Render, considere APP_BASE_URL para links absolutos de reset
 APP_BASE_URL = os.getenv("APP_BASE_URL", "")
 
-db = SQLAlchemy(app)
+# ------------------------------------------------------------------------------
+# Réplica de leitura (opcional)
+# ------------------------------------------------------------------------------
+# Com DATABASE_REPLICA_URL, os SELECTs de views marcadas com @read_only vão
+# para a réplica; flush, DML e SQL textual continuam no primário. Quem acabou
+# de escrever fica READ_YOUR_WRITES_SECONDS lendo do primário (marca na
+# sessão do Flask), para não ver a réplica atrasada em relação à própria
+# alteração.
+REPLICA_URL = os.getenv("DATABASE_REPLICA_URL", "")
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+class RoutingSession(FlaskSQLAlchemySession):
+    """Sessão que envia leituras de views somente-leitura para a réplica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and getattr(clause, "is_select", False)
+            and has_request_context()
+            and g.get("db_read_replica")
+        ):
+            return self._db.engines["replica"]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def read_only(view):
+    """Marca a view como elegível para ler da réplica."""
+    view.read_only = True
+    return view
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+# Rotas, hooks, filtros e comandos ficam no blueprint; create_app() o registra.
+bp = Blueprint("main", __name__, cli_group=None)
 
 # ------------------------------------------------------------------------------
 # Modelos
@@ -37,6 +173,8 @@ class User(db.Model):
     __tablename__ = "users"
     id         = db.Column(db.Integer, primary_key=True)
     name       = db.Column(db.String(200), nullable=False)
+    # nome sem acentos e em casefold (search_key), para busca por prefixo
+    name_key   = db.Column(db.String(200), nullable=True)
     dob        = db.Column(db.Date, nullable=True)
     sex        = db.Column(db.String(50), nullable=True)
     cpf        = db.Column(db.String(40), nullable=True)
@@ -58,11 +196,17 @@ class User(db.Model):
 
     cats = db.relationship("Cat", backref="owner", lazy=True)
 
+    __table_args__ = (
+        db.Index("ix_users_created_at_id", "created_at", "id"),
+        # busca incremental de donos por prefixo do nome (/api/users/lookup)
+        db.Index("ix_users_name_key_id", "name_key", "id"),
+    )
+
     def set_password(self, raw):
-        self.password_hash = generate_password_hash(raw)
+        self.password_hash = hash_password(raw)
 
     def check_password(self, raw):
-        return check_password_hash(self.password_hash, raw)
+        return verify_password(self.password_hash, raw)
 
 
 class Breed(db.Model):
@@ -75,12 +219,23 @@ class Breed(db.Model):
 
 class Color(db.Model):
     __tablename__ = "colors"
+    __table_args__ = (db.UniqueConstraint("breed_id", "name", name="uq_colors_breed_name"),)
     id       = db.Column(db.Integer, primary_key=True)
     breed_id = db.Column(db.Integer, db.ForeignKey("breeds.id"), nullable=False)
     name     = db.Column(db.String(200), nullable=False)
     ems_code = db.Column(db.String(100), nullable=False)
 
 
+class Litter(db.Model):
+    """Ninhada cadastrada de uma vez; os filhotes são gatos com litter_id."""
+    __tablename__ = "litters"
+    id         = db.Column(db.Integer, primary_key=True)
+    owner_id   = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    dob        = db.Column(db.Date, nullable=True)
+    size       = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=dt.datetime.utcnow)
+
+
 class Cat(db.Model):
     __tablename__ = "cats"
     id        = db.Column(db.Integer, primary_key=True)
@@ -97,6 +252,11 @@ class Cat(db.Model):
     registry_number = db.Column(db.String(120), nullable=True)
     registry_entity = db.Column(db.String(120), nullable=True)  # "FIFE Brasil" | "FIFE não Brasil" | "não FIFE"
 
+    # formas canônicas para detectar duplicatas (ver normalize_microchip e
+    # normalize_registry); preenchidas num hook de before_flush
+    microchip_norm = db.Column(db.String(120), nullable=True)
+    registry_norm  = db.Column(db.String(120), nullable=True)
+
     breeder_type = db.Column(db.String(40), nullable=True)  # "eu mesmo" | "outro"
     breeder_name = db.Column(db.String(200), nullable=True)
 
@@ -108,6 +268,11 @@ class Cat(db.Model):
     dam_breed_id    = db.Column(db.Integer, db.ForeignKey("breeds.id"), nullable=True)
     dam_color_id    = db.Column(db.Integer, db.ForeignKey("colors.id"), nullable=True)
 
+    # pais cadastrados no clube (opcional; sire_name/dam_name continuam valendo)
+    sire_id = db.Column(db.Integer, db.ForeignKey("cats.id"), nullable=True)
+    dam_id  = db.Column(db.Integer, db.ForeignKey("cats.id"), nullable=True)
+    litter_id = db.Column(db.Integer, db.ForeignKey("litters.id"), nullable=True)
+
     status     = db.Column(db.String(20), default="pending")  # "pending" | "approved" | "rejected"
     created_at = db.Column(db.DateTime, default=dt.datetime.utcnow)
 
@@ -117,20 +282,315 @@ class Cat(db.Model):
     sire_color = db.relationship("Color", foreign_keys=[sire_color_id], lazy=True)
     dam_breed  = db.relationship("Breed", foreign_keys=[dam_breed_id], lazy=True)
     dam_color  = db.relationship("Color", foreign_keys=[dam_color_id], lazy=True)
+    sire = db.relationship("Cat", foreign_keys=[sire_id], remote_side=[id], lazy=True)
+    dam  = db.relationship("Cat", foreign_keys=[dam_id], remote_side=[id], lazy=True)
+    litter = db.relationship("Litter", lazy=True)
+
+    __table_args__ = (
+        db.Index("ix_cats_status_created_at", "status", "created_at"),
+        db.Index("ix_cats_owner_created_at", "owner_id", "created_at"),
+        db.Index("ix_cats_breed_created_at", "breed_id", "created_at"),
+        db.Index("ix_cats_created_at_id", "created_at", "id"),
+        db.Index("ix_cats_sire_id", "sire_id"),
+        db.Index("ix_cats_dam_id", "dam_id"),
+        db.Index("ix_cats_litter_id", "litter_id"),
+        db.Index("ix_cats_microchip_norm", "microchip_norm"),
+        db.Index("ix_cats_registry_norm", "registry_norm", "registry_entity"),
+    )
+
+# Buscas por email usam func.lower(User.email), que não aproveita o índice
+# único da coluna. (colors já tem UNIQUE(breed_id, name), que atende
+# /api/colors: filtro por breed_id ordenado por nome.)
+db.Index("ix_users_email_lower", func.lower(User.email))
+
+class RefVersion(db.Model):
+    """Contador de versão de dados de referência, compartilhado entre workers."""
+    __tablename__ = "ref_versions"
+    name    = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class Job(db.Model):
+    """Tarefa administrativa pesada, executada fora do request (`flask worker`)."""
+    __tablename__ = "jobs"
+    id           = db.Column(db.Integer, primary_key=True)
+    kind         = db.Column(db.String(50), nullable=False)
+    status       = db.Column(db.String(20), nullable=False, default="queued")  # queued | running | done | failed
+    payload      = db.Column(db.Text, nullable=False, default="{}")
+    result       = db.Column(db.Text, nullable=True)
+    error        = db.Column(db.Text, nullable=True)
+    progress     = db.Column(db.Integer, nullable=False, default=0)
+    total        = db.Column(db.Integer, nullable=True)
+    attempts     = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    created_by   = db.Column(db.Integer, nullable=True)  # users.id (sem FK: o histórico sobrevive ao usuário)
+    locked_by    = db.Column(db.String(100), nullable=True)
+    run_after    = db.Column(db.DateTime, nullable=False, default=dt.datetime.utcnow)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    created_at   = db.Column(db.DateTime, default=dt.datetime.utcnow)
+    started_at   = db.Column(db.DateTime, nullable=True)
+    finished_at  = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index("ix_jobs_status_run_after", "status", "run_after", "id"),
+    )
+
+
+class CatStat(db.Model):
+    """Contagem de gatos por (dimensão, chave, status), mantida incrementalmente."""
+    __tablename__ = "cat_stats"
+    dimension = db.Column(db.String(20), primary_key=True)   # breed | color | registry | week
+    key       = db.Column(db.String(120), primary_key=True)  # id, entidade ou segunda-feira da semana
+    status    = db.Column(db.String(20), primary_key=True)
+    count     = db.Column(db.Integer, nullable=False, default=0)
+
+# ------------------------------------------------------------------------------
+# Hashing de senhas (pool de processos com limite de fila)
+# ------------------------------------------------------------------------------
+# scrypt/pbkdf2 são CPU puro: rodando no thread do request, um pico de
+# cadastros/logins trava o worker inteiro. O cálculo vai para um pool de
+# HASH_WORKERS processos (criado sob demanda em cada worker do gunicorn) e no
+# máximo HASH_QUEUE_LIMIT hashes ficam em andamento ou na fila; acima disso,
+# espera-se até HASH_QUEUE_TIMEOUT s e então o request é recusado com 503.
+# HASH_WORKERS=0 calcula no próprio processo.
+HASH_METHOD = os.getenv("HASH_METHOD", "scrypt")  # ex.: "scrypt:65536:8:1", "pbkdf2:sha256:600000"
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", "2"))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", str(max(1, HASH_WORKERS) * 4)))
+HASH_QUEUE_TIMEOUT = float(os.getenv("HASH_QUEUE_TIMEOUT", "2"))
+
+class HashingBusy(Exception):
+    """Fila de hashing cheia; o request deve ser recusado."""
+
+_hash_pool = {"pid": None, "executor": None}
+_hash_slots = threading.BoundedSemaphore(HASH_QUEUE_LIMIT)
+
+def _hash_executor():
+    if _hash_pool["pid"] != os.getpid():
+        # import tardio: multiprocessing só é carregado no primeiro hash
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        _hash_pool["executor"] = ProcessPoolExecutor(
+            max_workers=HASH_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+        _hash_pool["pid"] = os.getpid()
+    return _hash_pool["executor"]
+
+def _run_hashing(fn, *args):
+    if HASH_WORKERS <= 0:
+        return fn(*args)
+    if not _hash_slots.acquire(timeout=HASH_QUEUE_TIMEOUT):
+        raise HashingBusy()
+    try:
+        return _hash_executor().submit(fn, *args).result()
+    finally:
+        _hash_slots.release()
+
+def _canonical_hash_method(method):
+    # mesma expansão de defaults que o werkzeug grava no prefixo do hash
+    parts = method.split(":")
+    if parts[0] == "scrypt":
+        n, r, p = (parts[1:] + ["", "", ""])[:3]
+        return f"scrypt:{n or 2**15}:{r or 8}:{p or 1}"
+    if parts[0] == "pbkdf2":
+        name, iterations = (parts[1:] + ["", ""])[:2]
+        return f"pbkdf2:{name or 'sha256'}:{iterations or DEFAULT_PBKDF2_ITERATIONS}"
+    return method
+
+def hash_password(raw):
+    return _run_hashing(generate_password_hash, raw, HASH_METHOD)
+
+def verify_password(pw_hash, raw):
+    return _run_hashing(check_password_hash, pw_hash, raw)
+
+def password_needs_rehash(pw_hash):
+    return pw_hash.split("$", 1)[0] != _canonical_hash_method(HASH_METHOD)
+
+# ------------------------------------------------------------------------------
+# Rate limiting (login / cadastro) com token buckets
+# ------------------------------------------------------------------------------
+# Cada chave (IP ou email) tem um balde de `capacity` fichas que se recarrega
+# a capacity/period fichas por segundo; cada tentativa gasta uma. A checagem
+# vem antes da consulta ao usuário e do hash, então uma enxurrada de bots custa
+# só um acesso a dicionário. Por padrão os baldes ficam na memória de cada
+# worker; com RATE_LIMIT_STORE=sqlite:/caminho/arquivo.db todos os workers
+# compartilham os mesmos baldes.
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory")
+RATE_LIMITS = {
+    # nome: "fichas/segundos"
+    "login_ip": os.getenv("RATE_LIMIT_LOGIN_IP", "20/60"),
+    "login_email": os.getenv("RATE_LIMIT_LOGIN_EMAIL", "5/300"),
+    "register_ip": os.getenv("RATE_LIMIT_REGISTER_IP", "5/3600"),
+}
+
+def _parse_rate(spec):
+    tokens, period = spec.split("/")
+    capacity = float(tokens)
+    return capacity, capacity / float(period)
+
+class MemoryRateStore:
+    """Baldes na memória do processo, em ordem de uso (LRU).
+
+    Cheio, o store descarta os baldes usados há mais tempo: um ataque com
+    milhares de emails distintos empurra para fora só baldes parados, não o
+    do próprio IP, que é tocado a cada tentativa. Tentativa negada não cria
+    balde novo.
+    """
+    max_keys = 100000
+
+    def __init__(self):
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, refill, now):
+        with self._lock:
+            known = key in self._buckets
+            tokens, last = self._buckets[key] if known else (capacity, now)
+            tokens = min(capacity, tokens + (now - last) * refill)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            if known or allowed:
+                self._buckets[key] = (tokens, now)
+                self._buckets.move_to_end(key)
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+        return allowed, 0 if allowed else (1 - tokens) / refill
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+class SQLiteRateStore:
+    """Baldes num arquivo SQLite compartilhado entre os workers."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, capacity, refill, now):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, last = row if row else (capacity, now)
+            tokens = min(capacity, tokens + max(0.0, now - last) * refill)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            elif row is None:  # tentativa negada não cria balde
+                conn.execute("COMMIT")
+                return allowed, (1 - tokens) / refill
+            conn.execute(
+                "INSERT INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, 0 if allowed else (1 - tokens) / refill
+
+    def reset(self, key):
+        self._conn().execute("DELETE FROM rate_buckets WHERE key = ?", (key,))
+
+def _make_rate_store(spec):
+    if spec.startswith("sqlite:"):
+        return SQLiteRateStore(spec[len("sqlite:"):])
+    return MemoryRateStore()
+
+rate_store = _make_rate_store(RATE_LIMIT_STORE)
+
+def rate_limited(*checks):
+    """Consome uma ficha de cada (limite, chave); devolve segundos de espera.
+
+    0 significa liberado. Os baldes são sempre consumidos todos, para que
+    um atacante não contorne o limite por email variando o IP e vice-versa.
+    """
+    if not RATE_LIMIT_ENABLED:
+        return 0
+    now = time.time()
+    wait = 0
+    for limit, key in checks:
+        capacity, refill = _parse_rate(RATE_LIMITS[limit])
+        allowed, retry_after = rate_store.take(f"{limit}:{key}", capacity, refill, now)
+        if not allowed:
+            wait = max(wait, retry_after)
+    return wait
+
+def _too_many_attempts(template, wait):
+    wait = max(1, int(wait + 0.999))
+    flash(f"Muitas tentativas. Tente novamente em {wait} s.", "danger")
+    return render_template(template), 429, {"Retry-After": str(wait)}
 
 # ------------------------------------------------------------------------------
 # Helpers: auth & paginação
 # ------------------------------------------------------------------------------
 def _reset_serializer():
-    return URLSafeTimedSerializer(app.config["SECRET_KEY"], salt="password-reset")
+    return URLSafeTimedSerializer(current_app.config["SECRET_KEY"], salt="password-reset")
+
+# Identidade de sessão: a sessão assinada guarda só o id e a "versão de
+# credencial" (hash curto de password_hash + is_admin). Nome e perfil vêm de
+# um cache TTL por worker, renovado com um SELECT de poucas colunas; g.user
+# é esse Principal (id, nome, is_admin), nunca a linha completa de User.
+# Trocar a senha ou o perfil de admin muda a versão e encerra as sessões
+# existentes (em até AUTH_CACHE_TTL s nos demais workers).
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "30"))
+Principal = namedtuple("Principal", "id name is_admin")
+_principal_cache = {}  # uid -> (expira_em, credential_version, Principal)
+
+def _credential_version(password_hash, is_admin):
+    raw = f"{password_hash}|{bool(is_admin)}".encode()
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+def _login_user(u):
+    _principal_cache.pop(u.id, None)
+    session["user_id"] = u.id
+    session["cv"] = _credential_version(u.password_hash, u.is_admin)
+
+def _forget_principal(uid):
+    _principal_cache.pop(uid, None)
+
+def _lookup_principal(uid):
+    now = time.monotonic()
+    hit = _principal_cache.get(uid)
+    if hit and hit[0] > now:
+        return hit[1], hit[2]
+    row = db.session.execute(
+        select(User.name, User.is_admin, User.password_hash).where(User.id == uid)
+    ).first()
+    if not row:
+        _forget_principal(uid)
+        return None, None
+    if len(_principal_cache) > 10000:
+        _principal_cache.clear()
+    cv = _credential_version(row.password_hash, row.is_admin)
+    principal = Principal(uid, row.name, bool(row.is_admin))
+    _principal_cache[uid] = (now + AUTH_CACHE_TTL, cv, principal)
+    return cv, principal
 
 def login_required(fn):
     from functools import wraps
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        if not session.get("user_id"):
+        if not g.get("user"):
             flash("Faça login para continuar.", "warning")
-            return redirect(url_for("login"))
+            return redirect(url_for("main.login"))
         return fn(*args, **kwargs)
     return wrapper
 
@@ -138,32 +598,125 @@ def admin_required(fn):
     from functools import wraps
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        uid = session.get("user_id")
-        if not uid:
+        if not g.get("user"):
             flash("Faça login para continuar.", "warning")
-            return redirect(url_for("login"))
-        user = db.session.get(User, uid)
-        if not user or not user.is_admin:
+            return redirect(url_for("main.login"))
+        if not g.user.is_admin:
             flash("Acesso restrito ao administrador.", "danger")
-            return redirect(url_for("index"))
-        g.user = user
+            return redirect(url_for("main.index"))
         return fn(*args, **kwargs)
     return wrapper
 
-def _paginate(query, page, per_page=20):
-    total = query.count()
+# Paginação por cursor (keyset) em (created_at, id): o custo de cada página
+# não cresce com a profundidade, ao contrário de OFFSET. O total exibido vem
+# de um COUNT em cache por combinação de filtros (aproximado por até TTL s).
+COUNT_CACHE_TTL = int(os.getenv("COUNT_CACHE_TTL", "60"))
+_count_cache = {}  # chave -> (expira_em, total)
+
+def _cursor_serializer():
+    return URLSafeSerializer(current_app.config["SECRET_KEY"], salt="page-cursor")
+
+def _encode_cursor(direction, values, page):
+    return _cursor_serializer().dumps({
+        "d": direction,
+        "k": [v.isoformat() if isinstance(v, dt.datetime) else v for v in values],
+        "p": page,
+    })
+
+def _decode_cursor(token, key_cols):
+    try:
+        data = _cursor_serializer().loads(token)
+        values = []
+        for col, v in zip(key_cols, data["k"]):
+            if isinstance(col.type, db.DateTime) and v is not None:
+                v = dt.datetime.fromisoformat(v)
+            values.append(v)
+        if data["d"] not in ("next", "prev") or len(values) != len(key_cols):
+            return None
+        return data["d"], values, max(1, int(data["p"]))
+    except (BadSignature, KeyError, TypeError, ValueError):
+        return None
+
+def _cached_count(query, count_key):
+    if count_key is None:
+        return query.order_by(None).count()
+    now = time.monotonic()
+    hit = _count_cache.get(count_key)
+    if hit and hit[0] > now:
+        return hit[1]
+    total = query.order_by(None).count()
+    if len(_count_cache) > 1000:
+        _count_cache.clear()
+    _count_cache[count_key] = (now + COUNT_CACHE_TTL, total)
+    return total
+
+def _invalidate_counts(prefix):
+    for key in [k for k in _count_cache if k and k[0] == prefix]:
+        _count_cache.pop(key, None)
+
+def _paginate_keyset(query, key_cols, cursor=None, page=1, per_page=20,
+                     count_key=None, key_of=None):
+    """Pagina `query` em ordem decrescente de `key_cols` usando cursores opacos.
+
+    Sem cursor e com page > 1 (link direto), cai no OFFSET tradicional.
+    `key_of(item)` extrai os valores da chave de cada item; por padrão lê
+    os atributos homônimos das colunas.
+    Devolve os itens e o dicionário de paginação usado pelos templates
+    (page, total_pages, has_prev/has_next...), acrescido de `next_cursor`
+    e `prev_cursor`.
+    """
+    if key_of is None:
+        key_of = lambda item: [getattr(item, col.key) for col in key_cols]
+    total = _cached_count(query, count_key)
     total_pages = max(1, (total + per_page - 1) // per_page)
-    page = max(1, min(page, total_pages))
-    items = query.offset((page - 1) * per_page).limit(per_page).all()
+    base = query.order_by(None)
+    desc_order = [col.desc() for col in key_cols]
+
+    decoded = _decode_cursor(cursor, key_cols) if cursor else None
+    if decoded:
+        direction, values, page = decoded
+        if direction == "next":
+            rows = (
+                base.filter(tuple_(*key_cols) < tuple_(*values))
+                .order_by(*desc_order).limit(per_page + 1).all()
+            )
+            has_next = len(rows) > per_page
+            items = rows[:per_page]
+            has_prev = True
+        else:
+            rows = (
+                base.filter(tuple_(*key_cols) > tuple_(*values))
+                .order_by(*[col.asc() for col in key_cols]).limit(per_page + 1).all()
+            )
+            has_prev = len(rows) > per_page
+            items = list(reversed(rows[:per_page]))
+            has_next = True
+            if not has_prev:
+                page = 1
+    else:
+        page = max(1, min(page, total_pages))
+        rows = (
+            base.order_by(*desc_order)
+            .offset((page - 1) * per_page).limit(per_page + 1).all()
+        )
+        has_next = len(rows) > per_page
+        items = rows[:per_page]
+        has_prev = page > 1
+
+    if not items:
+        has_next = False
+    total_pages = max(total_pages, page + (1 if has_next else 0))
     return items, {
         "page": page,
         "per_page": per_page,
         "total": total,
         "total_pages": total_pages,
-        "has_prev": page > 1,
-        "has_next": page < total_pages,
-        "prev_page": page - 1 if page > 1 else None,
-        "next_page": page + 1 if page < total_pages else None,
+        "has_prev": has_prev,
+        "has_next": has_next,
+        "prev_page": page - 1 if has_prev else None,
+        "next_page": page + 1 if has_next else None,
+        "prev_cursor": _encode_cursor("prev", key_of(items[0]), page - 1) if has_prev and items else "",
+        "next_cursor": _encode_cursor("next", key_of(items[-1]), page + 1) if has_next else "",
     }
 
 def _parse_date(s):
@@ -174,46 +727,1216 @@ def _parse_date(s):
     except Exception:
         return None
 
+# ------------------------------------------------------------------------------
+# Cache de dados de referência (raças e cores)
+# ------------------------------------------------------------------------------
+# Raças e cores mudam raramente. Cada worker guarda um snapshot imutável
+# (tuplas de namedtuples) associado à versão lida de `ref_versions`; a versão
+# é conferida uma vez por request que usa os dados (um SELECT pela PK) e
+# qualquer alteração em raças/cores a incrementa na mesma transação, o que
+# invalida os snapshots de todos os workers. Cores são carregadas por raça
+# sob demanda e memorizadas dentro do snapshot.
+BreedRef = namedtuple("BreedRef", "id name")
+ColorRef = namedtuple("ColorRef", "id name ems_code")
+
+REF_KEY = "breeds_colors"
+_ref_snapshot = {"version": None, "breeds": (), "colors": {}, "memo": {}}
+
+def _ref_version():
+    if "ref_version" not in g:
+        g.ref_version = db.session.execute(
+            select(RefVersion.version).where(RefVersion.name == REF_KEY)
+        ).scalar() or 0
+    return g.ref_version
+
+def _ref_data():
+    global _ref_snapshot
+    version = _ref_version()
+    snap = _ref_snapshot
+    if snap["version"] != version:
+        breeds = tuple(
+            BreedRef(*row)
+            for row in db.session.query(Breed.id, Breed.name).order_by(Breed.name.asc())
+        )
+        snap = _ref_snapshot = {"version": version, "breeds": breeds, "colors": {}, "memo": {}}
+    return snap
+
+def ref_breeds():
+    """Todas as raças, ordenadas por nome."""
+    return _ref_data()["breeds"]
+
+def ref_colors(breed_id):
+    """Cores de uma raça, ordenadas por nome."""
+    snap = _ref_data()
+    colors = snap["colors"].get(breed_id)
+    if colors is None:
+        colors = tuple(
+            ColorRef(*row)
+            for row in db.session.query(Color.id, Color.name, Color.ems_code)
+            .filter(Color.breed_id == breed_id)
+            .order_by(Color.name.asc())
+        )
+        snap["colors"][breed_id] = colors
+    return colors
+
+def ref_memo(key, build):
+    """Memoriza `build()` enquanto a versão dos dados de referência não mudar."""
+    memo = _ref_data()["memo"]
+    if key not in memo:
+        if len(memo) >= 1000:
+            memo.clear()
+        memo[key] = build()
+    return memo[key]
+
+def bump_ref_version():
+    """Marca raças/cores como alteradas; chamar antes do commit da mudança."""
+    updated = db.session.execute(
+        RefVersion.__table__.update()
+        .where(RefVersion.name == REF_KEY)
+        .values(version=RefVersion.version + 1)
+    ).rowcount
+    if not updated:
+        db.session.add(RefVersion(name=REF_KEY, version=1))
+    g.pop("ref_version", None)
+
+# ------------------------------------------------------------------------------
+# Cache de fragmentos renderizados (selects e outros parciais de template)
+# ------------------------------------------------------------------------------
+# Nos templates: {% call cached_fragment("nome", parte1, ...) %}...{% endcall %}.
+# A chave inclui a versão dos dados de referência (ou `version=` explícito),
+# então uma alteração em raças/cores faz as entradas antigas deixarem de ser
+# usadas; elas saem pelo LRU. Limitado em número de entradas e em bytes.
+FRAGMENT_CACHE_MAX_ENTRIES = int(os.getenv("FRAGMENT_CACHE_MAX_ENTRIES", "512"))
+FRAGMENT_CACHE_MAX_BYTES = int(os.getenv("FRAGMENT_CACHE_MAX_BYTES", str(4 * 1024 * 1024)))
+
+class FragmentCache:
+    """LRU de fragmentos HTML, limitado em entradas e em tamanho total."""
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = self.misses = 0
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            html = self._items.get(key)
+            if html is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return html
+
+    def set(self, key, html):
+        if len(html) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._items[key] = html
+            self._size += len(html)
+            while len(self._items) > self.max_entries or self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+fragment_cache = FragmentCache(FRAGMENT_CACHE_MAX_ENTRIES, FRAGMENT_CACHE_MAX_BYTES)
+
+@bp.app_template_global()
+def cached_fragment(name, *parts, caller, version=None):
+    key = (name, _ref_version() if version is None else version) + parts
+    html = fragment_cache.get(key)
+    if html is None:
+        html = str(caller())
+        fragment_cache.set(key, html)
+    return Markup(html)
+
+# ------------------------------------------------------------------------------
+# Busca textual: FTS5 (trigram) no SQLite, pg_trgm no Postgres
+# ------------------------------------------------------------------------------
+# No SQLite o índice é a tabela virtual `cats_fts` (rowid = cats.id), com o
+# nome do dono desnormalizado; ela é mantida em sincronia pelo hook de flush
+# abaixo. O tokenizador trigram casa substrings (como o antigo ilike '%q%'),
+# inclusive no meio de microchips e números de registro. No Postgres, o
+# mesmo ilike passa a ser atendido por índices GIN gin_trgm_ops.
+SEARCH_MIN_LEN = 3  # trigram não indexa termos com menos de 3 caracteres
+
+cats_fts = table("cats_fts", column("rowid"))
+_search_state = {}
+
+def _search_backend():
+    """'fts5', 'pg_trgm' ou None (cai no ilike sem índice)."""
+    if "backend" not in _search_state:
+        backend = None
+        dialect = db.engine.dialect.name
+        if dialect == "sqlite":
+            found = db.session.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type='table' AND name='cats_fts'")
+            ).first()
+            backend = "fts5" if found else None
+        elif dialect == "postgresql":
+            found = db.session.execute(
+                text("SELECT 1 FROM pg_extension WHERE extname='pg_trgm'")
+            ).first()
+            backend = "pg_trgm" if found else None
+        _search_state["backend"] = backend
+    return _search_state["backend"]
+
+def init_search_index():
+    """Cria (ou recria) o índice de busca a partir das tabelas atuais."""
+    dialect = db.engine.dialect.name
+    try:
+        if dialect == "sqlite":
+            db.session.execute(text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS cats_fts USING fts5("
+                "name, microchip, registry_number, owner_name, tokenize='trigram')"
+            ))
+            db.session.execute(text("DELETE FROM cats_fts"))
+            # carga completa: fundir 16 segmentos por vez (padrão: 4) corta boa
+            # parte do custo de merge; o padrão volta ao final
+            db.session.execute(text("INSERT INTO cats_fts(cats_fts, rank) VALUES ('automerge', 16)"))
+            db.session.execute(text(
+                "INSERT INTO cats_fts(rowid, name, microchip, registry_number, owner_name) "
+                "SELECT c.id, c.name, c.microchip, c.registry_number, u.name "
+                "FROM cats c LEFT JOIN users u ON u.id = c.owner_id"
+            ))
+            db.session.execute(text("INSERT INTO cats_fts(cats_fts, rank) VALUES ('automerge', 4)"))
+        elif dialect == "postgresql":
+            db.session.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            for name, tbl, col in (
+                ("ix_cats_name_trgm", "cats", "name"),
+                ("ix_cats_microchip_trgm", "cats", "microchip"),
+                ("ix_cats_registry_number_trgm", "cats", "registry_number"),
+                ("ix_users_name_trgm", "users", "name"),
+            ):
+                db.session.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS {name} ON {tbl} USING gin ({col} gin_trgm_ops)"
+                ))
+        db.session.commit()
+    except OperationalError as e:
+        # SQLite sem FTS5/trigram (< 3.34): a busca segue no ilike.
+        db.session.rollback()
+        print(f"[setup] Índice de busca indisponível: {e}")
+    _search_state.clear()
+
+_FTS_UPSERT = (
+    "INSERT INTO cats_fts(rowid, name, microchip, registry_number, owner_name) "
+    "SELECT c.id, c.name, c.microchip, c.registry_number, u.name "
+    "FROM cats c LEFT JOIN users u ON u.id = c.owner_id "
+)
+
+@event.listens_for(db.session, "after_flush")
+def _sync_search_index(session, flush_context):
+    if not (session.new or session.dirty or session.deleted):
+        return
+    if _search_backend() != "fts5":
+        return
+    conn = session.connection()
+    for obj in session.deleted:
+        if isinstance(obj, Cat):
+            conn.execute(text("DELETE FROM cats_fts WHERE rowid = :id"), {"id": obj.id})
+        elif isinstance(obj, User):
+            conn.execute(text(
+                "DELETE FROM cats_fts WHERE rowid IN (SELECT id FROM cats WHERE owner_id = :uid)"
+            ), {"uid": obj.id})
+    cat_ids = [obj.id for obj in list(session.new) + list(session.dirty) if isinstance(obj, Cat)]
+    if cat_ids:
+        # um par de statements por flush (ninhadas gravam vários gatos juntos)
+        params = {"ids": cat_ids}
+        conn.execute(text("DELETE FROM cats_fts WHERE rowid IN :ids")
+                     .bindparams(bindparam("ids", expanding=True)), params)
+        conn.execute(text(_FTS_UPSERT + "WHERE c.id IN :ids")
+                     .bindparams(bindparam("ids", expanding=True)), params)
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, User) and inspect(obj).attrs.name.history.has_changes():
+            conn.execute(text(
+                "DELETE FROM cats_fts WHERE rowid IN (SELECT id FROM cats WHERE owner_id = :uid)"
+            ), {"uid": obj.id})
+            conn.execute(text(_FTS_UPSERT + "WHERE c.owner_id = :uid"), {"uid": obj.id})
+
+def _fts_match(q):
+    phrase = '"' + q.replace('"', '""') + '"'
+    return literal_column("cats_fts").op("MATCH")(phrase)
+
+def _cat_ilike(q):
+    # exige `users` na query (join com o dono)
+    like = f"%{q}%"
+    return or_(
+        Cat.name.ilike(like),
+        Cat.microchip.ilike(like),
+        Cat.registry_number.ilike(like),
+        User.name.ilike(like),
+    )
+
+def cat_search_condition(q):
+    """Condição WHERE da busca `q`, para queries que já juntam `users`."""
+    if len(q) >= SEARCH_MIN_LEN and _search_backend() == "fts5":
+        return Cat.id.in_(select(cats_fts.c.rowid).where(_fts_match(q)))
+    return _cat_ilike(q)
+
+def _search_cats(query, q):
+    """Aplica a busca `q` a uma query de Cat.
+
+    Devolve (query, score): com índice, a query passa a render linhas
+    (Cat, score) ordenáveis por relevância; sem índice, score é None e a
+    query segue rendendo Cat com o filtro ilike original.
+    """
+    backend = _search_backend() if len(q) >= SEARCH_MIN_LEN else None
+    if backend == "fts5":
+        # MATERIALIZED: sem isso o SQLite pode reavaliar o MATCH para cada
+        # linha de `cats` vinda de outro índice (ex.: status), em vez de
+        # partir dos poucos resultados da busca.
+        hits = (
+            select(
+                cats_fts.c.rowid.label("cat_id"),
+                (-func.bm25(literal_column("cats_fts"))).label("score"),
+            )
+            .where(_fts_match(q))
+            .cte("hits")
+            .prefix_with("MATERIALIZED")
+        )
+        query = query.join(hits, hits.c.cat_id == Cat.id).add_columns(hits.c.score)
+        return query, hits.c.score
+
+    query = query.join(User, Cat.owner).filter(_cat_ilike(q))
+    if backend == "pg_trgm":
+        score = func.greatest(
+            func.similarity(Cat.name, q),
+            func.similarity(func.coalesce(Cat.microchip, ""), q),
+            func.similarity(func.coalesce(Cat.registry_number, ""), q),
+            func.similarity(User.name, q),
+        ).label("score")
+        return query.add_columns(score), score
+    return query, None
+
+# ------------------------------------------------------------------------------
+# Listas de gatos (colunas projetadas)
+# ------------------------------------------------------------------------------
+# As listagens exibem meia dúzia de campos. Carregar Cat com joinedload de
+# dono, raça e cor hidrata quatro objetos por linha (User inteiro, com hash
+# de senha) e passa todos pelo identity map só para copiá-los num dict.
+# Aqui a consulta seleciona apenas as colunas usadas, com joins explícitos,
+# e as Rows do SQLAlchemy (tuplas com acesso por nome, fora do identity map)
+# vão direto para o template.
+CAT_LIST_COLUMNS = (
+    Cat.id, Cat.name, Cat.sex, Cat.dob, Cat.status, Cat.created_at,
+    Cat.registry_number, Cat.registry_entity, Cat.litter_id,
+    Breed.name.label("breed_name"),
+    Color.name.label("color_name"),
+    Color.ems_code,
+)
+
+def cat_list_query(with_owner=False):
+    """Query de linhas para listas de gatos; com `with_owner`, junta `users`
+    e acrescenta `owner_name`."""
+    columns = CAT_LIST_COLUMNS + ((User.name.label("owner_name"),) if with_owner else ())
+    query = (
+        db.session.query(*columns)
+        .select_from(Cat)
+        .outerjoin(Breed, Breed.id == Cat.breed_id)
+        .outerjoin(Color, Color.id == Cat.color_id)
+    )
+    if with_owner:
+        query = query.join(User, User.id == Cat.owner_id)
+    return query
+
+def cat_list_rows(ids, with_owner=False):
+    """Linhas de cat_list_query para `ids`, na ordem dada.
+
+    Para páginas: a paginação (COUNT incluso) roda numa query só de chaves,
+    sem os joins de exibição, e só as linhas da página são projetadas.
+    """
+    if not ids:
+        return []
+    by_id = {r.id: r for r in cat_list_query(with_owner).filter(Cat.id.in_(ids))}
+    return [by_id[i] for i in ids if i in by_id]
+
+# ------------------------------------------------------------------------------
+# Identificadores normalizados (microchip e registro duplicados)
+# ------------------------------------------------------------------------------
+# O mesmo microchip chega como "986 000 123 456 789" ou "986-000123456789", e
+# o mesmo registro FIFe como "BR*FFB LO 0042" ou "br*ffb-lo-42". A forma
+# canônica fica em colunas indexadas (microchip_norm, registry_norm), mantidas
+# num hook de before_flush; `flask rebuild-identifiers` preenche bancos
+# antigos. A verificação no cadastro e na edição é uma busca por igualdade no
+# índice, e a fila de pendentes marca possíveis duplicatas com uma consulta
+# por lote de linhas. Gatos rejeitados não contam como duplicata.
+
+# até 2 parâmetros por linha: 5000 linhas ficam abaixo do limite de 32766
+# variáveis do SQLite (>= 3.32) e a fila inteira sai em poucas consultas
+DUPLICATE_CHUNK = 5000
+IDENTIFIER_LABELS = {"microchip": "microchip", "registry": "registro"}
+
+_ID_SEPARATORS = re.compile(r"[\s\-./_]+")
+_LEADING_ZEROS = re.compile(r"(?<!\d)0+(?=\d)")
+
+def normalize_microchip(value):
+    """Microchip sem espaços, hífens, pontos e barras, em maiúsculas (alguns
+    leitores exportam em hexadecimal). None quando não sobra nada."""
+    return _ID_SEPARATORS.sub("", value or "").upper() or None
+
+def _fife_registry(value):
+    # FIFe: separadores e zeros à esquerda do número variam entre documentos
+    return _LEADING_ZEROS.sub("", _ID_SEPARATORS.sub("", value).upper())
+
+def _plain_registry(value):
+    # outras entidades: formatos próprios, zeros podem ser significativos
+    return _ID_SEPARATORS.sub("", value).upper()
+
+REGISTRY_NORMALIZERS = {
+    "FIFE Brasil": _fife_registry,
+    "FIFE não Brasil": _fife_registry,
+}
+
+def normalize_registry(registry_entity, registry_number):
+    """Número de registro na forma canônica da entidade; None se vazio."""
+    if not registry_number:
+        return None
+    return REGISTRY_NORMALIZERS.get(registry_entity, _plain_registry)(registry_number) or None
+
+@event.listens_for(db.session, "before_flush")
+def _normalize_identifiers(session, flush_context, instances):
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Cat):
+            obj.microchip_norm = normalize_microchip(obj.microchip)
+            obj.registry_norm = normalize_registry(obj.registry_entity, obj.registry_number)
+
+def _not_rejected():
+    return func.coalesce(Cat.status, "pending") != "rejected"
+
+def find_duplicates(microchip, registry_entity, registry_number, exclude_id=None):
+    """Outros gatos (não rejeitados) com o mesmo microchip ou registro.
+
+    Devolve {"microchip": cat_id, "registry": cat_id} só com os campos que
+    colidem. Cada campo é uma busca por igualdade no seu índice.
+    """
+    chip = normalize_microchip(microchip)
+    reg = normalize_registry(registry_entity, registry_number)
+    lookups = {
+        "microchip": (Cat.microchip_norm == chip,) if chip else None,
+        "registry": (
+            Cat.registry_norm == reg,
+            Cat.registry_entity.is_not_distinct_from(registry_entity),
+        ) if reg else None,
+    }
+    found = {}
+    for field, conds in lookups.items():
+        if conds is None:
+            continue
+        query = db.session.query(Cat.id).filter(*conds, _not_rejected())
+        if exclude_id is not None:
+            query = query.filter(Cat.id != exclude_id)
+        cat_id = query.order_by(Cat.id).limit(1).scalar()
+        if cat_id is not None:
+            found[field] = cat_id
+    return found
+
+def duplicate_errors(found, show_ids=False):
+    """Mensagens para o resultado de find_duplicates; o id do outro gato só
+    aparece para admins."""
+    messages = {
+        "microchip": "Este microchip já está cadastrado no clube",
+        "registry": "Este número de registro já está cadastrado nesta entidade",
+    }
+    return [
+        messages[field] + (f" (gato #{cat_id})." if show_ids else ".")
+        for field, cat_id in found.items()
+    ]
+
+def duplicate_flags(rows):
+    """Para linhas com id, microchip_norm, registry_entity e registry_norm,
+    devolve {id: ["microchip", "registry"]} das que têm outro gato não
+    rejeitado com o mesmo identificador. Uma consulta por lote de linhas."""
+    flags = {}
+    for i in range(0, len(rows), DUPLICATE_CHUNK):
+        chunk = rows[i:i + DUPLICATE_CHUNK]
+        chips = {r.microchip_norm for r in chunk if r.microchip_norm}
+        regs = {r.registry_norm for r in chunk if r.registry_norm}
+        conds = []
+        if chips:
+            conds.append(Cat.microchip_norm.in_(chips))
+        if regs:
+            conds.append(Cat.registry_norm.in_(regs))
+        if not conds:
+            continue
+        by_chip, by_reg = {}, {}
+        for cat_id, chip, entity, reg in (
+            db.session.query(Cat.id, Cat.microchip_norm, Cat.registry_entity, Cat.registry_norm)
+            .filter(or_(*conds), _not_rejected())
+        ):
+            if chip in chips:
+                by_chip.setdefault(chip, set()).add(cat_id)
+            if reg in regs:
+                by_reg.setdefault((entity, reg), set()).add(cat_id)
+        for r in chunk:
+            if r.microchip_norm and by_chip.get(r.microchip_norm, set()) - {r.id}:
+                flags.setdefault(r.id, []).append("microchip")
+            if r.registry_norm and by_reg.get((r.registry_entity, r.registry_norm), set()) - {r.id}:
+                flags.setdefault(r.id, []).append("registry")
+    return flags
+
+def rebuild_identifiers(batch=5000):
+    """Recalcula microchip_norm e registry_norm de todos os gatos, em lotes
+    por id (backfill e mudança de regra). Não faz commit."""
+    conn = db.session.connection()
+    last_id = updated = 0
+    while True:
+        rows = conn.execute(
+            select(Cat.id, Cat.microchip, Cat.registry_entity, Cat.registry_number)
+            .where(Cat.id > last_id).order_by(Cat.id).limit(batch)
+        ).all()
+        if not rows:
+            return updated
+        conn.execute(
+            update(Cat.__table__)
+            .where(Cat.__table__.c.id == bindparam("cid"))
+            .values(microchip_norm=bindparam("chip"), registry_norm=bindparam("reg")),
+            [{"cid": cid, "chip": normalize_microchip(chip),
+              "reg": normalize_registry(entity, number)}
+             for cid, chip, entity, number in rows],
+        )
+        updated += len(rows)
+        last_id = rows[-1][0]
+
+# ------------------------------------------------------------------------------
+# Estatísticas de gatos (tabela de resumo cat_stats)
+# ------------------------------------------------------------------------------
+# Cada gato conta uma vez em cada dimensão (raça, cor, entidade de registro e
+# semana de cadastro), separado por status. As alterações feitas pelo ORM
+# (cadastro, edição, aprovação individual, exclusão) viram deltas num hook de
+# after_flush, na mesma transação; a moderação em lote aplica os deltas das
+# linhas que o UPDATE devolve. `flask rebuild-stats` recalcula tudo a partir
+# de `cats` (backfill e correção de desvios).
+STATS_DIMENSIONS = ("breed", "color", "registry", "week")
+STATS_FIELDS = ("status", "breed_id", "color_id", "registry_entity", "created_at")
+STATS_WEEKS = 26
+
+def _week_key(created_at):
+    if created_at is None:
+        return ""
+    day = created_at.date() if isinstance(created_at, dt.datetime) else created_at
+    return (day - dt.timedelta(days=day.weekday())).isoformat()
+
+def _stat_keys(status, breed_id, color_id, registry_entity, created_at):
+    status = status or "pending"
+    return (
+        ("breed", "" if breed_id is None else str(breed_id), status),
+        ("color", "" if color_id is None else str(color_id), status),
+        ("registry", registry_entity or "", status),
+        ("week", _week_key(created_at), status),
+    )
+
+def _dialect_insert(dialect_name):
+    """insert() com ON CONFLICT do dialeto; o módulo do PostgreSQL só é
+    importado quando o banco é PostgreSQL."""
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects import postgresql
+        return postgresql.insert
+    return sqlite.insert
+
+def apply_stat_deltas(deltas, conn=None):
+    """Soma `deltas` {(dimensão, chave, status): n} em cat_stats (upsert)."""
+    rows = [
+        {"dimension": d, "key": k, "status": s, "count": n}
+        for (d, k, s), n in deltas.items() if n
+    ]
+    if not rows:
+        return
+    conn = conn if conn is not None else db.session.connection()
+    stmt = _dialect_insert(conn.dialect.name)(CatStat.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["dimension", "key", "status"],
+        set_={"count": CatStat.__table__.c.count + stmt.excluded["count"]},
+    )
+    conn.execute(stmt, rows)
+
+def _add_stat_row(deltas, values, n):
+    for k in _stat_keys(*values):
+        deltas[k] = deltas.get(k, 0) + n
+
+@event.listens_for(db.session, "after_flush")
+def _sync_cat_stats(session, flush_context):
+    deltas = {}
+    for obj in session.new:
+        if isinstance(obj, Cat):
+            _add_stat_row(deltas, [getattr(obj, f) for f in STATS_FIELDS], 1)
+    for obj in session.deleted:
+        if isinstance(obj, Cat):
+            _add_stat_row(deltas, [getattr(obj, f) for f in STATS_FIELDS], -1)
+    for obj in session.dirty:
+        if not isinstance(obj, Cat) or obj in session.new or obj in session.deleted:
+            continue
+        attrs = inspect(obj).attrs
+        histories = [attrs[f].history for f in STATS_FIELDS]
+        if not any(h.has_changes() for h in histories):
+            continue
+        old = [h.deleted[0] if h.deleted else (h.unchanged[0] if h.unchanged else None)
+               for h in histories]
+        new = [h.added[0] if h.added else (h.unchanged[0] if h.unchanged else None)
+               for h in histories]
+        _add_stat_row(deltas, old, -1)
+        _add_stat_row(deltas, new, 1)
+    apply_stat_deltas(deltas, session.connection())
+
+def _week_expr(dialect):
+    if dialect == "postgresql":
+        return func.to_char(func.date_trunc("week", Cat.created_at), "YYYY-MM-DD")
+    return func.date(Cat.created_at, "weekday 0", "-6 days")
+
+def rebuild_cat_stats():
+    """Recalcula cat_stats com um GROUP BY por dimensão. Não faz commit."""
+    dialect = db.engine.dialect.name
+    keys = {
+        "breed": Cat.breed_id,
+        "color": Cat.color_id,
+        "registry": Cat.registry_entity,
+        "week": _week_expr(dialect),
+    }
+    db.session.execute(CatStat.__table__.delete())
+    for dim, col in keys.items():
+        rows = (
+            db.session.query(col, func.coalesce(Cat.status, "pending"), func.count())
+            .group_by(col, func.coalesce(Cat.status, "pending"))
+            .all()
+        )
+        deltas = {}
+        for key, status, n in rows:
+            k = (dim, "" if key is None else str(key), status)
+            deltas[k] = deltas.get(k, 0) + n
+        apply_stat_deltas(deltas)
+
+def cat_stats_summary(weeks=STATS_WEEKS):
+    """Lê cat_stats e devolve totais por status, raça, cor, registro e semana."""
+    by_dim = {d: {} for d in STATS_DIMENSIONS}
+    for dim, key, status, n in db.session.query(
+        CatStat.dimension, CatStat.key, CatStat.status, CatStat.count
+    ).filter(CatStat.count > 0):
+        row = by_dim.setdefault(dim, {}).setdefault(key, {"total": 0})
+        row[status] = row.get(status, 0) + n
+        row["total"] += n
+
+    by_status = {}
+    for row in by_dim["breed"].values():
+        for status, n in row.items():
+            if status != "total":
+                by_status[status] = by_status.get(status, 0) + n
+
+    breed_names = {str(b.id): b.name for b in ref_breeds()}
+    color_info = {}
+    color_ids = [int(k) for k in by_dim["color"] if k]
+    if color_ids:
+        for c in db.session.query(Color.id, Color.name, Color.ems_code, Breed.name) \
+                .outerjoin(Breed, Breed.id == Color.breed_id).filter(Color.id.in_(color_ids)):
+            color_info[str(c[0])] = c[1:]
+
+    def rows(dim, label, **extra):
+        out = [dict(key=k, label=label(k), **{n: f(k) for n, f in extra.items()}, **v)
+               for k, v in by_dim[dim].items()]
+        return sorted(out, key=lambda r: (-r["total"], r["label"]))
+
+    def missing(k, empty):
+        return empty if not k else f"#{k} (removida)"
+
+    colors = rows(
+        "color",
+        lambda k: color_info[k][0] if k in color_info else missing(k, "Sem cor"),
+        ems_code=lambda k: color_info.get(k, (None, None, None))[1],
+        breed=lambda k: color_info.get(k, (None, None, None))[2],
+    )
+    week_rows = sorted(
+        ({"week": k, **v} for k, v in by_dim["week"].items() if k), key=lambda r: r["week"]
+    )[-weeks:]
+    return {
+        "total": sum(by_status.values()),
+        "by_status": by_status,
+        "by_breed": rows("breed", lambda k: breed_names.get(k) or missing(k, "Sem raça")),
+        "by_color": colors,
+        "by_registry": rows("registry", lambda k: k or "Não informado"),
+        "by_week": week_rows,
+    }
+
+# ------------------------------------------------------------------------------
+# Pedigree: ancestrais, descendentes e COI (Wright)
+# ------------------------------------------------------------------------------
+# Ancestrais e descendentes de N gerações saem de uma única CTE recursiva
+# (UNION deduplica quem aparece por mais de um caminho na mesma profundidade).
+# O COI usa o método tabular: F(x) = parentesco(pai, mãe), e o parentesco é
+# calculado recursivamente sobre o grafo já carregado, memorizando cada par, de
+# forma que ancestrais comuns a vários caminhos são avaliados uma vez só.
+PEDIGREE_GENERATIONS = int(os.getenv("PEDIGREE_GENERATIONS", "10"))
+MAX_PEDIGREE_GENERATIONS = 20
+
+PedigreeNode = namedtuple("PedigreeNode", "id name sex sire_id dam_id depth")
+
+def _pedigree_generations(n):
+    if n is None:
+        return PEDIGREE_GENERATIONS
+    return max(0, min(int(n), MAX_PEDIGREE_GENERATIONS))
+
+def _pedigree_cte(seed_ids, generations, towards):
+    """CTE recursiva a partir de `seed_ids`, subindo ("up") ou descendo ("down")."""
+    cats = Cat.__table__
+    cols = lambda t: (t.c.id, t.c.name, t.c.sex, t.c.sire_id, t.c.dam_id)
+    cte = (
+        select(*cols(cats), literal(0).label("depth"))
+        .where(cats.c.id.in_(seed_ids))
+        .cte("pedigree", recursive=True)
+    )
+    rel = cats.alias("rel")
+    if towards == "up":
+        link = or_(rel.c.id == cte.c.sire_id, rel.c.id == cte.c.dam_id)
+    else:
+        link = or_(rel.c.sire_id == cte.c.id, rel.c.dam_id == cte.c.id)
+    return cte.union(
+        select(*cols(rel), cte.c.depth + 1)
+        .join(cte, link)
+        .where(cte.c.depth < generations)
+    )
+
+def load_pedigree(seed_ids, generations=None, towards="up"):
+    """Devolve {id: PedigreeNode} com a menor profundidade de cada gato."""
+    seed_ids = [i for i in seed_ids if i is not None]
+    if not seed_ids:
+        return {}
+    cte = _pedigree_cte(seed_ids, _pedigree_generations(generations), towards)
+    nodes = {}
+    for row in db.session.execute(select(cte)):
+        node = PedigreeNode(*row)
+        if node.id not in nodes or node.depth < nodes[node.id].depth:
+            nodes[node.id] = node
+    return nodes
+
+class PedigreeGraph:
+    """Grafo de ancestrais carregado de uma vez, com COI memorizado."""
+
+    def __init__(self, nodes):
+        self.nodes = nodes
+        self.parents = {
+            n.id: (n.sire_id if n.sire_id in nodes else None,
+                   n.dam_id if n.dam_id in nodes else None)
+            for n in nodes.values()
+        }
+        self._order = {}
+        self._kinship = {}
+        self._inbreeding = {}
+
+    @classmethod
+    def for_cats(cls, cat_ids, generations=None):
+        return cls(load_pedigree(cat_ids, generations))
+
+    def order(self, x):
+        """Geração relativa (fundadores = 0); um ancestral tem sempre ordem menor."""
+        if x not in self._order:
+            known = [self.order(p) for p in self.parents[x] if p is not None]
+            self._order[x] = 1 + max(known) if known else 0
+        return self._order[x]
+
+    def ancestors(self, x):
+        seen, stack = set(), [p for p in self.parents.get(x, ()) if p is not None]
+        while stack:
+            p = stack.pop()
+            if p not in seen:
+                seen.add(p)
+                stack.extend(q for q in self.parents[p] if q is not None)
+        return seen
+
+    def kinship(self, a, b):
+        """Coeficiente de parentesco entre a e b (0 se algum é desconhecido)."""
+        if a is None or b is None or a not in self.parents or b not in self.parents:
+            return 0.0
+        key = (a, b) if a <= b else (b, a)
+        if key in self._kinship:
+            return self._kinship[key]
+        if a == b:
+            value = 0.5 * (1.0 + self.inbreeding(a))
+        else:
+            if self.order(a) < self.order(b):
+                a, b = b, a
+            sire, dam = self.parents[a]
+            value = 0.5 * (self.kinship(sire, b) + self.kinship(dam, b))
+        self._kinship[key] = value
+        return value
+
+    def inbreeding(self, x):
+        """COI de Wright do gato x dentro das gerações carregadas."""
+        if x not in self._inbreeding:
+            sire, dam = self.parents.get(x, (None, None))
+            self._inbreeding[x] = self.kinship(sire, dam)
+        return self._inbreeding[x]
+
+def cat_coi(cat_id, generations=None):
+    return PedigreeGraph.for_cats([cat_id], generations).inbreeding(cat_id)
+
+def litter_coi(sire_id, dam_id, generations=None):
+    """COI esperado dos filhotes de um cruzamento (parentesco entre os pais)."""
+    graph = PedigreeGraph.for_cats([sire_id, dam_id], generations)
+    return graph.kinship(sire_id, dam_id)
+
+def _parents_error(cat_id, sire_id, dam_id):
+    """Valida sire_id/dam_id: existem, não são o próprio gato nem descendentes."""
+    if sire_id is None and dam_id is None:
+        return None
+    if sire_id is not None and sire_id == dam_id:
+        return "Pai e mãe não podem ser o mesmo gato."
+    ids = [i for i in (sire_id, dam_id) if i is not None]
+    found = dict(db.session.query(Cat.id, Cat.sex).filter(Cat.id.in_(ids)))
+    for pid, label, wrong_sex in ((sire_id, "Pai", "Fêmea"), (dam_id, "Mãe", "Macho")):
+        if pid is None:
+            continue
+        if pid not in found:
+            return f"{label}: gato #{pid} não encontrado."
+        if found[pid] == wrong_sex:
+            return f"{label}: gato #{pid} está cadastrado como {wrong_sex.lower()}."
+    if cat_id is not None:
+        descendants = load_pedigree([cat_id], MAX_PEDIGREE_GENERATIONS, towards="down")
+        if sire_id in descendants or dam_id in descendants:
+            return "Um gato não pode ser descendente de si mesmo."
+    return None
+
+# ------------------------------------------------------------------------------
+# Instrumentação SQL por request
+# ------------------------------------------------------------------------------
+# Conta statements e tempo de banco de cada request (eventos de cursor em todos
+# os engines), devolve o resultado em Server-Timing e registra em log:
+# statements acima de SLOW_QUERY_MS (com parâmetros) e SELECTs idênticos
+# repetidos N_PLUS_ONE_THRESHOLD+ vezes, o padrão típico de lazy load (N+1).
+# Com SQL_LOG_REQUESTS=1, emite também uma linha JSON por request.
+SQL_INSTRUMENTATION = os.getenv("SQL_INSTRUMENTATION", "1") == "1"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+SQL_LOG_REQUESTS = os.getenv("SQL_LOG_REQUESTS", "0") == "1"
+
+sql_logger = logging.getLogger("catclube.sql")
+if not sql_logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    sql_logger.addHandler(_handler)
+    sql_logger.setLevel(logging.INFO)
+    sql_logger.propagate = False
+
+def _log_event(level, **fields):
+    sql_logger.log(level, json.dumps(fields, ensure_ascii=False, default=str))
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_start")
+    if not started:
+        return
+    elapsed_ms = (time.perf_counter() - started.pop()) * 1000
+    if not SQL_INSTRUMENTATION:
+        return
+    in_request = has_request_context()
+    if elapsed_ms >= SLOW_QUERY_MS:
+        _log_event(
+            logging.WARNING, event="slow_query", ms=round(elapsed_ms, 2),
+            path=request.path if in_request else None,
+            statement=statement, params=repr(parameters)[:500],
+        )
+    if in_request and "sql_stats" in g:
+        stats = g.sql_stats
+        stats["count"] += 1
+        stats["ms"] += elapsed_ms
+        stats["statements"][statement] = stats["statements"].get(statement, 0) + 1
+
+@bp.before_app_request
+def _start_sql_stats():
+    if SQL_INSTRUMENTATION:
+        g.sql_stats = {"count": 0, "ms": 0.0, "statements": {}, "started": time.perf_counter()}
+
+@bp.after_app_request
+def _report_sql_stats(resp):
+    stats = g.get("sql_stats")
+    if not stats:
+        return resp
+    total_ms = (time.perf_counter() - stats["started"]) * 1000
+    resp.headers.add(
+        "Server-Timing",
+        f'db;dur={stats["ms"]:.2f};desc="{stats["count"]} queries", app;dur={total_ms:.2f}',
+    )
+    repeated = {
+        stmt: n for stmt, n in stats["statements"].items()
+        if n >= N_PLUS_ONE_THRESHOLD and stmt.lstrip().upper().startswith("SELECT")
+    }
+    for stmt, n in repeated.items():
+        _log_event(logging.WARNING, event="n_plus_one", path=request.path,
+                   endpoint=request.endpoint, repeats=n, statement=stmt)
+    if SQL_LOG_REQUESTS:
+        _log_event(
+            logging.INFO, event="request", method=request.method, path=request.path,
+            endpoint=request.endpoint, status=resp.status_code, queries=stats["count"],
+            db_ms=round(stats["ms"], 2), total_ms=round(total_ms, 2),
+        )
+    return resp
+
+# ------------------------------------------------------------------------------
+# Compressão de respostas e cache de arquivos estáticos
+# ------------------------------------------------------------------------------
+# Respostas de texto/JSON acima de COMPRESSION_MIN_SIZE saem em brotli (se o
+# pacote estiver instalado) ou gzip, conforme o Accept-Encoding do cliente.
+# Respostas em streaming (exportações, arquivos estáticos) são comprimidas
+# pedaço a pedaço, com flush a cada pedaço, sem bufferizar o corpo inteiro.
+# Estáticos referenciados por static_url() levam o hash do conteúdo na URL
+# (?v=...) e podem ser cacheados pelo navegador por um ano.
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "1") == "1"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/javascript", "application/x-ndjson",
+    "application/xml", "image/svg+xml",
+)
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+def _compression_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+def compress_body(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    z = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31 = formato gzip
+    return z.compress(data) + z.flush()
+
+def _compress_chunks(chunks, encoding):
+    if encoding == "br":
+        c = brotli.Compressor(quality=BROTLI_QUALITY)
+        compress, flush, finish = c.process, c.flush, c.finish
+    else:
+        z = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        compress, flush, finish = z.compress, lambda: z.flush(zlib.Z_SYNC_FLUSH), z.flush
+    for chunk in chunks:
+        out = compress(chunk) + flush()
+        if out:
+            yield out
+    yield finish()
+
+@bp.after_app_request
+def _compress_response(resp):
+    if (
+        not COMPRESSION_ENABLED
+        or resp.status_code != 200
+        or "Content-Encoding" in resp.headers
+        or not (resp.mimetype or "").startswith(COMPRESSIBLE_TYPES)
+    ):
+        return resp
+    resp.vary.add("Accept-Encoding")
+    encoding = request.accept_encodings.best_match(_compression_encodings())
+    if encoding is None:
+        return resp
+    length = resp.content_length
+    if length is not None and length < COMPRESSION_MIN_SIZE:
+        return resp
+
+    if resp.is_streamed or resp.direct_passthrough:
+        original = resp.response
+        resp.response = _compress_chunks(resp.iter_encoded(), encoding)
+        resp.direct_passthrough = False
+        if hasattr(original, "close"):
+            resp.call_on_close(original.close)
+        resp.headers.pop("Content-Length", None)
+    else:
+        data = resp.get_data()
+        if len(data) < COMPRESSION_MIN_SIZE:
+            return resp
+        resp.set_data(compress_body(data, encoding))
+    resp.headers["Content-Encoding"] = encoding
+    etag, weak = resp.get_etag()
+    if etag and not weak:
+        resp.set_etag(etag, weak=True)  # o corpo mudou de representação
+    return resp
+
+_static_hashes = {}  # filename -> (mtime, hash)
+
+def _static_hash(filename):
+    path = os.path.join(current_app.static_folder, filename)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    cached = _static_hashes.get(filename)
+    if cached is None or cached[0] != mtime:
+        with open(path, "rb") as fh:
+            cached = _static_hashes[filename] = (mtime, hashlib.sha1(fh.read()).hexdigest()[:12])
+    return cached[1]
+
+@bp.app_template_global()
+def static_url(filename):
+    """URL de um arquivo estático com o hash do conteúdo (cache imutável)."""
+    digest = _static_hash(filename)
+    if digest is None:
+        return url_for("static", filename=filename)
+    return url_for("static", filename=filename, v=digest)
+
+@bp.after_app_request
+def _static_cache_headers(resp):
+    if request.endpoint != "static" or resp.status_code not in (200, 304):
+        return resp
+    version = request.args.get("v")
+    if version and version == _static_hash(request.view_args.get("filename", "")):
+        resp.cache_control.public = True
+        resp.cache_control.max_age = STATIC_MAX_AGE
+        resp.cache_control.immutable = True
+        resp.cache_control.no_cache = None
+    return resp
+
+# ------------------------------------------------------------------------------
+# Fila de jobs em background (tabela `jobs` + `flask worker`)
+# ------------------------------------------------------------------------------
+# Ações administrativas pesadas viram um registro em `jobs` e o request volta
+# na hora. O worker reivindica o próximo job com um UPDATE ... RETURNING
+# atômico (vários workers podem rodar juntos), executa o handler registrado
+# para o tipo e grava o resultado. O handler reporta progresso por
+# JobRun.progress(), que também faz o commit do lote em andamento. Falhas são
+# tentadas de novo com espera exponencial até max_attempts; JobFailed
+# encerra sem novas tentativas. Jobs "running" sem heartbeat há mais de
+# JOB_STALE_SECONDS (worker morto) voltam para a fila.
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "10"))  # segundos, dobra a cada tentativa
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "300"))
+JOB_CHUNK = int(os.getenv("JOB_CHUNK", "1000"))
+JOB_SPOOL_DIR = os.getenv("JOB_SPOOL_DIR", os.path.join(BASE_DIR, "instance", "jobs"))
+
+job_logger = logging.getLogger("catclube.jobs")
+JOB_HANDLERS = {}
+
+class JobFailed(Exception):
+    """Erro definitivo: o job falha sem novas tentativas."""
+
+class JobRun:
+    """O que o handler recebe: payload do job e registro de progresso."""
+
+    def __init__(self, job):
+        self.id = job.id
+        self.attempt = job.attempts
+        self.last_attempt = job.attempts >= job.max_attempts
+        self.payload = json.loads(job.payload or "{}")
+
+    def progress(self, done, total=None):
+        """Grava o progresso e faz commit do que o handler já alterou."""
+        values = {"progress": int(done), "heartbeat_at": dt.datetime.utcnow()}
+        if total is not None:
+            values["total"] = int(total)
+        db.session.execute(update(Job).where(Job.id == self.id).values(**values))
+        db.session.commit()
+
+def job_handler(kind):
+    def register(fn):
+        JOB_HANDLERS[kind] = fn
+        return fn
+    return register
+
+def enqueue_job(kind, payload, created_by=None, max_attempts=None):
+    """Cria o job (com commit) e devolve o registro."""
+    job = Job(kind=kind, payload=json.dumps(payload), created_by=created_by,
+              max_attempts=max_attempts or JOB_MAX_ATTEMPTS)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def claim_job(worker_id):
+    """Marca o próximo job pronto como running para este worker; devolve o id."""
+    now = dt.datetime.utcnow()
+    next_id = (
+        select(Job.id)
+        .where(Job.status == "queued", Job.run_after <= now)
+        .order_by(Job.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    row = db.session.execute(
+        update(Job)
+        .where(Job.id == next_id, Job.status == "queued")
+        .values(status="running", locked_by=worker_id, attempts=Job.attempts + 1,
+                started_at=now, heartbeat_at=now)
+        .returning(Job.id)
+        .execution_options(synchronize_session=False)
+    ).first()
+    db.session.commit()
+    return row[0] if row else None
+
+def requeue_stale_jobs():
+    limit = dt.datetime.utcnow() - dt.timedelta(seconds=JOB_STALE_SECONDS)
+    stale = (Job.status == "running", Job.heartbeat_at < limit)
+    db.session.execute(
+        update(Job).where(*stale, Job.attempts >= Job.max_attempts)
+        .values(status="failed", error="worker interrompido", locked_by=None,
+                finished_at=dt.datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(
+        update(Job).where(*stale).values(status="queued", locked_by=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+def run_job(job_id):
+    """Executa um job já reivindicado; devolve True se terminou com sucesso."""
+    job = db.session.get(Job, job_id)
+    run = JobRun(job)
+    kind, attempts, max_attempts = job.kind, job.attempts, job.max_attempts
+    try:
+        handler = JOB_HANDLERS.get(kind)
+        if handler is None:
+            raise JobFailed(f"tipo de job desconhecido: {kind}")
+        result = handler(run)
+    except Exception as e:
+        db.session.rollback()
+        now = dt.datetime.utcnow()
+        values = {"error": f"{type(e).__name__}: {e}"[:2000], "locked_by": None}
+        if isinstance(e, JobFailed) or attempts >= max_attempts:
+            values.update(status="failed", finished_at=now)
+        else:
+            delay = JOB_RETRY_DELAY * 2 ** (attempts - 1)
+            values.update(status="queued", run_after=now + dt.timedelta(seconds=delay))
+        db.session.execute(update(Job).where(Job.id == job_id).values(**values))
+        db.session.commit()
+        job_logger.warning("job %s (%s) tentativa %s/%s falhou: %s",
+                           job_id, kind, attempts, max_attempts, e)
+        return False
+    db.session.execute(
+        update(Job).where(Job.id == job_id).values(
+            status="done", result=json.dumps(result, ensure_ascii=False, default=str),
+            error=None, locked_by=None, finished_at=dt.datetime.utcnow(),
+        )
+    )
+    db.session.commit()
+    return True
+
+def work(app, worker_id=None, poll=1.0, drain=False, should_stop=lambda: False):
+    """Laço do worker sobre `app`. Cada job roda num app context próprio (g e
+    sessão limpos). Com drain=True, volta quando a fila estiver vazia."""
+    worker_id = worker_id or f"{os.uname().nodename}:{os.getpid()}"
+    done = 0
+    while not should_stop():
+        with app.app_context():
+            requeue_stale_jobs()
+            job_id = claim_job(worker_id)
+            if job_id is not None:
+                run_job(job_id)
+                done += 1
+                continue
+        if drain:
+            break
+        time.sleep(poll)
+    return done
+
+def _job_json(job):
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "total": job.total,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "error": job.error,
+        "result": json.loads(job.result) if job.result else None,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
 # ------------------------------------------------------------------------------
 # Hooks & Context
 # ------------------------------------------------------------------------------
-@app.before_request
+@bp.before_app_request
 def load_current_user():
     g.user = None
     uid = session.get("user_id")
-    if uid:
-        g.user = db.session.get(User, uid)
-
-@app.context_processor
+    if not uid:
+        return
+    cv, principal = _lookup_principal(uid)
+    if principal is None or cv != session.get("cv"):
+        # usuário removido, senha/perfil alterados ou sessão anterior ao cv
+        session.pop("user_id", None)
+        session.pop("cv", None)
+        return
+    g.user = principal
+
+@bp.before_app_request
+def _route_reads():
+    # depois de load_current_user: autenticação sempre lê do primário
+    if "replica" not in db.engines:
+        return
+    view = current_app.view_functions.get(request.endpoint)
+    if getattr(view, "read_only", False) and session.get("rw_until", 0) < time.time():
+        g.db_read_replica = True
+
+@event.listens_for(db.session, "after_flush")
+def _mark_write(session_, flush_context):
+    if has_request_context():
+        g.db_wrote = True
+
+@event.listens_for(db.session, "do_orm_execute")
+def _mark_bulk_write(state):
+    if (state.is_update or state.is_delete or state.is_insert) and has_request_context():
+        g.db_wrote = True
+
+@bp.after_app_request
+def _stick_to_primary(resp):
+    if g.get("db_wrote") and "replica" in db.engines:
+        session["rw_until"] = time.time() + READ_YOUR_WRITES_SECONDS
+    return resp
+
+_BUSY_TEMPLATES = {
+    "main.login": "login.html",
+    "main.register": "register.html",
+    "main.reset_password": "reset_password.html",
+}
+
+@bp.app_errorhandler(HashingBusy)
+def hashing_busy(e):
+    db.session.rollback()
+    flash("Servidor ocupado no momento. Tente novamente em alguns segundos.", "warning")
+    template = _BUSY_TEMPLATES.get(request.endpoint)
+    body = render_template(template) if template else "Servidor ocupado."
+    return body, 503, {"Retry-After": "5"}
+
+@bp.app_context_processor
 def inject_user():
     return {"user": g.get("user")}
 
 # ------------------------------------------------------------------------------
 # Rotas públicas: index, cadastro, login, logout, dashboard, gato novo
 # ------------------------------------------------------------------------------
-@app.route("/", methods=["GET"])
+@bp.route("/", methods=["GET"])
 def index():
     return render_template("index.html")
 
-@app.route("/make-admin", methods=["POST"])
+@bp.route("/make-admin", methods=["POST"])
 def make_admin():
     # atalho demo: promover um usuário informado por email
     email = (request.form.get("email") or "").strip().lower()
     if not email:
         flash("Informe um e-mail.", "warning")
-        return redirect(url_for("index"))
+        return redirect(url_for("main.index"))
     u = db.session.query(User).filter(func.lower(User.email) == email).first()
     if not u:
         flash("Usuário não encontrado.", "warning")
-        return redirect(url_for("index"))
+        return redirect(url_for("main.index"))
     u.is_admin = True
     db.session.commit()
+    _forget_principal(u.id)
     flash(f"{u.email} agora é administrador.", "success")
-    return redirect(url_for("index"))
+    return redirect(url_for("main.index"))
 
-@app.route("/register", methods=["GET", "POST"])
+@bp.route("/register", methods=["GET", "POST"])
 def register():
     if request.method == "POST":
+        wait = rate_limited(("register_ip", request.remote_addr))
+        if wait:
+            return _too_many_attempts("register.html", wait)
         name  = (request.form.get("name") or "").strip()
         dob   = _parse_date(request.form.get("dob"))
         sex   = request.form.get("sex") or None
@@ -249,157 +1972,595 @@ def register():
         u.set_password(p1)
         db.session.add(u)
         db.session.commit()
+        _invalidate_counts("users")
 
-        session["user_id"] = u.id
+        _login_user(u)
         flash("Cadastro realizado. Bem-vindo!", "success")
-        return redirect(url_for("dashboard"))
+        return redirect(url_for("main.dashboard"))
     return render_template("register.html")
 
-@app.route("/login", methods=["GET", "POST"])
+@bp.route("/login", methods=["GET", "POST"])
 def login():
     if request.method == "POST":
         email = (request.form.get("email") or "").strip().lower()
         password = request.form.get("password") or ""
+        wait = rate_limited(("login_ip", request.remote_addr), ("login_email", email))
+        if wait:
+            return _too_many_attempts("login.html", wait)
         u = db.session.query(User).filter(func.lower(User.email)==email).first()
         if not u or not u.check_password(password):
             flash("Credenciais inválidas.", "danger")
             return render_template("login.html")
-        session["user_id"] = u.id
+        rate_store.reset(f"login_email:{email}")
+        if password_needs_rehash(u.password_hash):
+            # custo de hashing mudou desde que a senha foi gravada
+            u.set_password(password)
+            db.session.commit()
+        _login_user(u)
         flash("Login efetuado.", "success")
-        return redirect(url_for("dashboard"))
+        return redirect(url_for("main.dashboard"))
     return render_template("login.html")
 
-@app.route("/logout")
+@bp.route("/logout")
 def logout():
     session.pop("user_id", None)
+    session.pop("cv", None)
     flash("Você saiu da sua conta.", "info")
-    return redirect(url_for("index"))
+    return redirect(url_for("main.index"))
 
-@app.route("/dashboard")
+@bp.route("/dashboard")
 @login_required
 def dashboard():
-    cats = (
-        db.session.query(Cat)
-        .options(joinedload(Cat.breed), joinedload(Cat.color))
+    rows = (
+        cat_list_query()
         .filter(Cat.owner_id == g.user.id)
         .order_by(Cat.created_at.desc())
         .all()
     )
-    rows = []
-    for c in cats:
-        rows.append({
-            "name": c.name,
-            "breed_name": c.breed.name if c.breed else None,
-            "color_name": c.color.name if c.color else None,
-            "ems_code": c.color.ems_code if c.color else None,
-            "dob": c.dob.isoformat() if c.dob else None,
-            "status": c.status,
-        })
     return render_template("dashboard.html", cats=rows)
 
-@app.route("/cats/new", methods=["GET", "POST"])
+# Grafia canônica das entidades de registro: formulários antigos enviavam
+# "Não FIFE", e cat_stats/duplicatas agrupam pelo texto exato.
+REGISTRY_ENTITIES = ("FIFE Brasil", "FIFE não Brasil", "não FIFE")
+_REGISTRY_ENTITY_KEYS = {e.casefold(): e for e in REGISTRY_ENTITIES}
+
+def registry_entity_value(raw):
+    """Entidade de registro do formulário na grafia canônica; None se vazia."""
+    value = (raw or "").strip()
+    return _REGISTRY_ENTITY_KEYS.get(value.casefold(), value) or None
+
+# Pares (raça, cor) dos formulários de gato e ninhada. Com foreign_keys=ON,
+# um id inexistente só apareceria como IntegrityError (500) no commit; aqui
+# os ids são conferidos antes, contra os dados de referência em cache.
+CAT_REF_FIELDS = (
+    ("breed_id", "color_id", ""),
+    ("sire_breed_id", "sire_color_id", " do pai"),
+    ("dam_breed_id", "dam_color_id", " da mãe"),
+)
+
+def reference_errors(values, fields=CAT_REF_FIELDS):
+    """Mensagens para raças inexistentes e cores que não são da raça
+    informada; `values` mapeia campo -> id (ou None)."""
+    breed_ids = {b.id for b in ref_breeds()}
+    errors = []
+    for breed_field, color_field, label in fields:
+        breed_id, color_id = values.get(breed_field), values.get(color_field)
+        if breed_id is not None and breed_id not in breed_ids:
+            errors.append(f"Raça{label} inválida.")
+        elif color_id is not None and (breed_id is None or color_id not in _color_map(breed_id)):
+            errors.append(f"Selecione uma cor da raça{label}.")
+    return errors
+
+def _reference_ids(form):
+    return {f: form.get(f, type=int) for pair in CAT_REF_FIELDS for f in pair[:2]}
+
+@bp.route("/cats/new", methods=["GET", "POST"])
 @login_required
 def cat_new():
-    breeds = db.session.query(Breed).order_by(Breed.name.asc()).all()
+    breeds = ref_breeds()
     if request.method == "POST":
         name = (request.form.get("name") or "").strip()
         if not name:
             flash("Informe o nome do gato.", "warning")
-            return render_template("cat_form.html", breeds=breeds)
+            return render_template("cat_form.html", breeds=breeds, cat=request.form)
+        sire_id = request.form.get("sire_id", type=int)
+        dam_id = request.form.get("dam_id", type=int)
+        error = _parents_error(None, sire_id, dam_id)
+        if error:
+            flash(error, "warning")
+            return render_template("cat_form.html", breeds=breeds, cat=request.form)
+        refs = _reference_ids(request.form)
+        registry_entity = registry_entity_value(request.form.get("registry_entity"))
+        errors = reference_errors(refs) + duplicate_errors(find_duplicates(
+            request.form.get("microchip"), registry_entity, request.form.get("registry_number"),
+        ))
+        if errors:
+            for error in errors:
+                flash(error, "warning")
+            return render_template("cat_form.html", breeds=breeds, cat=request.form)
 
         cat = Cat(
             owner_id=g.user.id,
             name=name,
-            breed_id=request.form.get("breed_id", type=int),
-            color_id=request.form.get("color_id", type=int),
             dob=_parse_date(request.form.get("dob")),
             sex=request.form.get("sex") or None,
             neutered=(request.form.get("neutered") == "SIM"),
             microchip=request.form.get("microchip") or None,
             registry_number=request.form.get("registry_number") or None,
-            registry_entity=request.form.get("registry_entity") or None,
+            registry_entity=registry_entity,
             breeder_type=request.form.get("breeder_type") or None,
             breeder_name=request.form.get("breeder_name") or None,
             sire_name=request.form.get("sire_name") or None,
-            sire_breed_id=request.form.get("sire_breed_id", type=int),
-            sire_color_id=request.form.get("sire_color_id", type=int),
             dam_name=request.form.get("dam_name") or None,
-            dam_breed_id=request.form.get("dam_breed_id", type=int),
-            dam_color_id=request.form.get("dam_color_id", type=int),
+            sire_id=sire_id,
+            dam_id=dam_id,
             status="pending",
+            **refs,
         )
         db.session.add(cat)
         db.session.commit()
+        _invalidate_counts("cats")
         flash("Cadastro enviado para aprovação do administrador.", "success")
-        return redirect(url_for("dashboard"))
+        return redirect(url_for("main.dashboard"))
 
-    return render_template("cat_form.html", breeds=breeds)
+    return render_template("cat_form.html", breeds=breeds, cat=None)
+
+# ------------------------------------------------------------------------------
+# Ninhadas (cadastro de vários filhotes de uma vez)
+# ------------------------------------------------------------------------------
+# Os dados comuns (raça, nascimento, pais, criador, entidade) vêm uma vez e
+# cada filhote traz só nome, sexo, cor e microchip. Tudo é validado antes de
+# gravar (cores contra o mapa em cache da raça) e os filhotes entram juntos,
+# numa transação, ligados a um registro de `litters`; na fila de pendentes a
+# ninhada aparece agrupada e pode ser moderada de uma vez.
+LITTER_MAX_KITTENS = int(os.getenv("LITTER_MAX_KITTENS", "12"))
+LITTER_FORM_ROWS = 8
+LITTER_SHARED_FIELDS = (
+    "registry_entity", "breeder_type", "breeder_name", "sire_name", "dam_name",
+)
+LITTER_SHARED_IDS = (
+    "breed_id", "sire_id", "dam_id", "sire_breed_id", "sire_color_id",
+    "dam_breed_id", "dam_color_id",
+)
+
+def _color_map(breed_id):
+    return ref_memo(("color_map", breed_id), lambda: {c.id: c for c in ref_colors(breed_id)})
+
+def _as_int(value):
+    try:
+        return int(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+def _litter_from_form(form):
+    shared = {f: (form.get(f) or "").strip() or None for f in LITTER_SHARED_FIELDS}
+    shared["registry_entity"] = registry_entity_value(shared["registry_entity"])
+    shared.update({f: form.get(f, type=int) for f in LITTER_SHARED_IDS})
+    shared["dob"] = form.get("dob")
+    kittens = [
+        {"row": n, "name": name, "sex": sex, "color_id": color_id, "microchip": microchip}
+        for n, (name, sex, color_id, microchip) in enumerate(zip(
+            form.getlist("kitten_name"), form.getlist("kitten_sex"),
+            form.getlist("kitten_color_id"), form.getlist("kitten_microchip"),
+        ), start=1)
+        if (name or "").strip() or (microchip or "").strip()  # linhas em branco do formulário
+    ]
+    return shared, kittens
+
+def _litter_from_json(data):
+    shared = {f: (str(data.get(f) or "")).strip() or None for f in LITTER_SHARED_FIELDS}
+    shared["registry_entity"] = registry_entity_value(shared["registry_entity"])
+    shared.update({f: _as_int(data.get(f)) for f in LITTER_SHARED_IDS})
+    shared["dob"] = data.get("dob")
+    kittens = data.get("kittens")
+    return shared, kittens if isinstance(kittens, list) else []
+
+def register_litter(owner_id, shared, kittens):
+    """Valida a ninhada inteira e, sem erros, adiciona Litter e filhotes à
+    sessão (sem commit). Devolve (litter, erros)."""
+    errors = []
+    breed_id = shared.get("breed_id")
+    if breed_id not in {b.id for b in ref_breeds()}:
+        errors.append("Selecione a raça da ninhada.")
+    colors = _color_map(breed_id) if breed_id else {}
+    dob = _parse_date(shared.get("dob"))
+    if dob is None:
+        errors.append("Informe a data de nascimento da ninhada.")
+    elif dob > dt.date.today():
+        errors.append("A data de nascimento não pode estar no futuro.")
+    parents_error = _parents_error(None, shared.get("sire_id"), shared.get("dam_id"))
+    if parents_error:
+        errors.append(parents_error)
+    errors += reference_errors(shared, CAT_REF_FIELDS[1:])  # raça/cor do pai e da mãe
+    if not kittens:
+        errors.append("Informe ao menos um filhote.")
+    elif len(kittens) > LITTER_MAX_KITTENS:
+        errors.append(f"Uma ninhada pode ter no máximo {LITTER_MAX_KITTENS} filhotes.")
+
+    rows, chips = [], {}
+    for n, k in enumerate(kittens[:LITTER_MAX_KITTENS], start=1):
+        k = k if isinstance(k, dict) else {}
+        n = k.get("row", n)  # no formulário, a linha da tabela
+        name = (str(k.get("name") or "")).strip()
+        sex = k.get("sex")
+        color_id = _as_int(k.get("color_id"))
+        microchip = (str(k.get("microchip") or "")).strip() or None
+        chip = normalize_microchip(microchip)
+        if not name:
+            errors.append(f"Filhote {n}: informe o nome.")
+        if sex not in ("Macho", "Fêmea"):
+            errors.append(f"Filhote {n}: informe o sexo.")
+        if color_id is not None and color_id not in colors:
+            # id inexistente violaria a FK no commit; cor é opcional
+            errors.append(f"Filhote {n}: selecione uma cor da raça.")
+        if chip:
+            if chip in chips:
+                errors.append(f"Filhote {n}: microchip repetido na ninhada.")
+            chips[chip] = n
+        rows.append({"name": name, "sex": sex, "color_id": color_id, "microchip": microchip})
+    if chips:
+        # uma consulta para todos os microchips da ninhada
+        taken = db.session.query(Cat.microchip_norm).filter(
+            Cat.microchip_norm.in_(chips), _not_rejected()
+        )
+        errors += [f"Filhote {chips[chip]}: este microchip já está cadastrado no clube."
+                   for (chip,) in taken.distinct()]
+    if errors:
+        return None, errors
+
+    now = dt.datetime.utcnow()
+    litter = Litter(owner_id=owner_id, dob=dob, size=len(rows), created_at=now)
+    common = {f: shared.get(f) for f in LITTER_SHARED_FIELDS + LITTER_SHARED_IDS}
+    db.session.add(litter)
+    db.session.add_all([
+        Cat(owner_id=owner_id, dob=dob, litter=litter, status="pending",
+            created_at=now, **common, **row)
+        for row in rows
+    ])
+    return litter, []
+
+@bp.route("/cats/litter", methods=["GET", "POST"])
+@login_required
+def cat_litter_new():
+    breeds = ref_breeds()
+    if request.method == "POST":
+        shared, kittens = _litter_from_form(request.form)
+        litter, errors = register_litter(g.user.id, shared, kittens)
+        if errors:
+            for error in errors:
+                flash(error, "warning")
+            return render_template("litter_form.html", breeds=breeds, form=request.form,
+                                   rows=max(LITTER_FORM_ROWS, len(kittens)))
+        db.session.commit()
+        _invalidate_counts("cats")
+        flash(f"Ninhada com {litter.size} filhotes enviada para aprovação do administrador.", "success")
+        return redirect(url_for("main.dashboard"))
+    return render_template("litter_form.html", breeds=breeds, form={}, rows=LITTER_FORM_ROWS)
+
+@bp.route("/api/litters", methods=["POST"])
+@login_required
+def api_litter_create():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "JSON body required"}), 400
+    litter, errors = register_litter(g.user.id, *_litter_from_json(data))
+    if errors:
+        return jsonify({"errors": errors}), 400
+    db.session.commit()
+    _invalidate_counts("cats")
+    cat_ids = [cid for (cid,) in db.session.query(Cat.id).filter(Cat.litter_id == litter.id).order_by(Cat.id)]
+    return jsonify({"litter_id": litter.id, "cat_ids": cat_ids, "status": "pending"}), 201
 
 # ------------------------------------------------------------------------------
 # API colors (para selects dinâmicos)
 # ------------------------------------------------------------------------------
-@app.route("/api/colors")
+# O ETag deriva da versão dos dados de referência e das raças pedidas, então
+# um If-None-Match válido é respondido com 304 sem consultar nem serializar
+# cores. `breed_ids=1,2,3` devolve {"1": [...], ...} numa única ida e volta.
+COLORS_MAX_AGE = int(os.getenv("COLORS_MAX_AGE", "60"))
+MAX_BULK_BREEDS = 50
+
+def _colors_json(breed_ids, bulk):
+    def rows(breed_id):
+        return [{"id": c.id, "name": c.name, "ems_code": c.ems_code} for c in ref_colors(breed_id)]
+    if bulk:
+        return current_app.json.dumps({str(b): rows(b) for b in breed_ids})
+    return current_app.json.dumps(rows(breed_ids[0]))
+
+@bp.route("/api/colors")
+@read_only
 @login_required
 def api_colors():
-    breed_id = request.args.get("breed_id", type=int)
-    if not breed_id:
-        return jsonify([])
-    colors = (
-        db.session.query(Color)
-        .filter(Color.breed_id == breed_id)
-        .order_by(Color.name.asc())
-        .all()
-    )
-    return jsonify([{"id": c.id, "name": c.name, "ems_code": c.ems_code} for c in colors])
+    raw_ids = request.args.get("breed_ids")
+    bulk = raw_ids is not None
+    if bulk:
+        breed_ids = sorted({int(x) for x in raw_ids.split(",") if x.strip().isdigit()})
+        breed_ids = breed_ids[:MAX_BULK_BREEDS]
+    else:
+        breed_id = request.args.get("breed_id", type=int)
+        breed_ids = [breed_id] if breed_id else []
+    if not breed_ids:
+        return jsonify({} if bulk else [])
+
+    key = ("bulk" if bulk else "one") + ":" + ",".join(map(str, breed_ids))
+    etag = f"colors-v{_ref_version()}-" + hashlib.sha1(key.encode()).hexdigest()[:16]
+    if request.if_none_match.contains_weak(etag):
+        resp = current_app.response_class(status=304)
+    else:
+        body = ref_memo(("colors-json", key), lambda: _colors_json(breed_ids, bulk))
+        resp = current_app.response_class(body, mimetype="application/json")
+    resp.set_etag(etag, weak=True)
+    resp.headers["Cache-Control"] = f"private, max-age={COLORS_MAX_AGE}"
+    resp.vary.add("Cookie")
+    return resp
+
+# ------------------------------------------------------------------------------
+# API pedigree (ancestrais / descendentes / COI de cruzamentos)
+# ------------------------------------------------------------------------------
+def _node_json(n):
+    return {"id": n.id, "name": n.name, "sex": n.sex,
+            "sire_id": n.sire_id, "dam_id": n.dam_id, "depth": n.depth}
+
+@bp.route("/api/cats/<int:cat_id>/pedigree")
+@read_only
+@login_required
+def api_cat_pedigree(cat_id):
+    generations = _pedigree_generations(request.args.get("generations", type=int))
+    direction = request.args.get("direction", "up")
+    if direction not in ("up", "down"):
+        return jsonify({"error": "invalid direction"}), 400
+    nodes = load_pedigree([cat_id], generations, towards=direction)
+    if cat_id not in nodes:
+        return jsonify({"error": "cat not found"}), 404
+    payload = {
+        "cat_id": cat_id,
+        "generations": generations,
+        "direction": direction,
+        "cats": [_node_json(n) for n in sorted(nodes.values(), key=lambda n: (n.depth, n.id))],
+    }
+    if direction == "up":
+        payload["coi"] = PedigreeGraph(nodes).inbreeding(cat_id)
+    return jsonify(payload)
+
+@bp.route("/api/coi")
+@read_only
+@login_required
+def api_litter_coi():
+    sire_id = request.args.get("sire_id", type=int)
+    dam_id = request.args.get("dam_id", type=int)
+    if not sire_id or not dam_id:
+        return jsonify({"error": "sire_id and dam_id are required"}), 400
+    generations = _pedigree_generations(request.args.get("generations", type=int))
+    graph = PedigreeGraph.for_cats([sire_id, dam_id], generations)
+    if sire_id not in graph.nodes or dam_id not in graph.nodes:
+        return jsonify({"error": "cat not found"}), 404
+    common = graph.ancestors(sire_id) & graph.ancestors(dam_id)
+    return jsonify({
+        "sire_id": sire_id,
+        "dam_id": dam_id,
+        "generations": generations,
+        "coi": graph.kinship(sire_id, dam_id),
+        "common_ancestors": [_node_json(graph.nodes[i]) for i in sorted(common)],
+    })
+
+# ------------------------------------------------------------------------------
+# API usuários (busca incremental do dono nos formulários de admin)
+# ------------------------------------------------------------------------------
+# Prefixo do nome (ou do email, se o termo tiver "@"), paginado por keyset sobre
+# os índices ix_users_name_key_id / ix_users_email_lower. O lower() do SQLite
+# só dobra ASCII, então o nome não é comparado com func.lower: a chave
+# (users.name_key) e o termo passam pelo mesmo search_key em Python, e o
+# cursor usa o valor da chave lido do banco.
+USER_LOOKUP_LIMIT = 20
+
+def search_key(value):
+    """Texto sem acentos e em casefold: "Ângela" -> "angela"."""
+    decomposed = unicodedata.normalize("NFKD", value or "")
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+@event.listens_for(db.session, "before_flush")
+def _user_name_keys(session, flush_context, instances):
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, User):
+            obj.name_key = search_key(obj.name)
+
+def backfill_user_name_keys(batch=5000):
+    """Preenche users.name_key onde ainda está vazio. Não faz commit."""
+    conn = db.session.connection()
+    rows = conn.execute(select(User.id, User.name).where(User.name_key.is_(None))).all()
+    for i in range(0, len(rows), batch):
+        conn.execute(
+            update(User.__table__).where(User.__table__.c.id == bindparam("uid"))
+            .values(name_key=bindparam("key")),
+            [{"uid": uid, "key": search_key(name)} for uid, name in rows[i:i + batch]],
+        )
+    return len(rows)
+
+@bp.route("/api/users/lookup")
+@read_only
+@admin_required
+def api_users_lookup():
+    q = (request.args.get("q") or "").strip()
+    limit = max(1, min(request.args.get("limit", USER_LOOKUP_LIMIT, type=int), 100))
+    if "@" in q:
+        # emails são gravados já em minúsculas (cadastro e edição)
+        key, q = func.lower(User.email), q.lower()
+    else:
+        key, q = User.name_key, search_key(q)
+    key_cols = (key, User.id)
+    query = db.session.query(User.id, User.name, User.email, key.label("sort_key"))
+    if q:
+        query = query.filter(key >= q, key < q + "\uffff")
+    after = _decode_cursor(request.args.get("after") or "", key_cols)
+    if after:
+        query = query.filter(tuple_(*key_cols) > tuple_(*after[1]))
+    rows = query.order_by(*key_cols).limit(limit + 1).all()
+    items, more = rows[:limit], len(rows) > limit
+    next_cursor = None
+    if more:
+        last = items[-1]
+        next_cursor = _encode_cursor("next", [last.sort_key, last.id], 1)
+    return jsonify({
+        "items": [{"id": r.id, "name": r.name, "email": r.email} for r in items],
+        "next": next_cursor,
+    })
 
 # ------------------------------------------------------------------------------
 # Admin - Home (pendentes) e ações aprovar/rejeitar
 # ------------------------------------------------------------------------------
-@app.route("/admin/home")
+@bp.route("/admin/home")
 @admin_required
 def admin_home():
-    cats = (
-        db.session.query(Cat)
-        .options(joinedload(Cat.breed), joinedload(Cat.color), joinedload(Cat.owner))
+    rows = (
+        cat_list_query(with_owner=True)
+        .add_columns(Cat.microchip_norm, Cat.registry_norm)
         .filter(Cat.status == "pending")
-        .order_by(Cat.created_at.desc())
+        .order_by(Cat.created_at.desc(), Cat.id.asc())
         .all()
     )
-    rows = []
-    for c in cats:
-        rows.append({
-            "id": c.id,
-            "name": c.name,
-            "owner_name": c.owner.name if c.owner else "-",
-            "breed_name": c.breed.name if c.breed else None,
-            "color_name": c.color.name if c.color else None,
-            "ems_code": c.color.ems_code if c.color else None,
-            "created_at": c.created_at.strftime("%Y-%m-%d %H:%M"),
-        })
-    return render_template("admin_pending.html", cats=rows)
-
-@app.route("/admin/cats/<int:cat_id>/<action>", methods=["POST"])
+    # filhotes de uma ninhada têm o mesmo created_at e ficam em sequência
+    litters = {}
+    for r in rows:
+        if r.litter_id is not None:
+            litters[r.litter_id] = litters.get(r.litter_id, 0) + 1
+    # "todos os pendentes" só alcança o que estava na fila quando a página foi
+    # renderizada: cadastros que chegarem depois ficam para a próxima leitura.
+    max_id = max((r.id for r in rows), default=0)
+    return render_template("admin_pending.html", cats=rows, max_id=max_id, litters=litters,
+                           duplicates=duplicate_flags(rows), duplicate_labels=IDENTIFIER_LABELS)
+
+@bp.route("/admin/cats/<int:cat_id>/<action>", methods=["POST"])
 @admin_required
 def admin_cat_action(cat_id, action):
     cat = db.session.get(Cat, cat_id)
     if not cat:
         flash("Gato não encontrado.", "warning")
-        return redirect(url_for("admin_home"))
+        return redirect(url_for("main.admin_home"))
     if action == "approve":
         cat.status = "approved"
     elif action == "reject":
         cat.status = "rejected"
     else:
         flash("Ação inválida.", "danger")
-        return redirect(url_for("admin_home"))
+        return redirect(url_for("main.admin_home"))
     db.session.commit()
+    _invalidate_counts("cats")
     flash("Status atualizado.", "success")
-    return redirect(url_for("admin_home"))
+    return redirect(url_for("main.admin_home"))
+
+MODERATION_STATUS = {"approve": "approved", "reject": "rejected"}
+MODERATION_CHUNK = 500
+
+def moderate_pending(action, cat_ids=None, max_id=None, litter_id=None):
+    """Aprova/rejeita em lote, só gatos ainda pendentes, numa transação.
+
+    Com `cat_ids`, aplica a esses ids; com `litter_id`, aos filhotes da
+    ninhada; sem eles, a todos os pendentes com id <= `max_id`. A condição
+    status='pending' no UPDATE faz com que gatos já moderados por outro
+    admin sejam ignorados; as linhas devolvidas pelo UPDATE alimentam
+    cat_stats. Devolve (atualizados, ignorados).
+    """
+    new_status = MODERATION_STATUS[action]
+    returning = (Cat.breed_id, Cat.color_id, Cat.registry_entity, Cat.created_at)
+    deltas = {}
+    def run(stmt):
+        rows = db.session.execute(
+            stmt.values(status=new_status).returning(*returning)
+            .execution_options(synchronize_session=False)
+        ).all()
+        for breed_id, color_id, registry_entity, created_at in rows:
+            _add_stat_row(deltas, ("pending", breed_id, color_id, registry_entity, created_at), -1)
+            _add_stat_row(deltas, (new_status, breed_id, color_id, registry_entity, created_at), 1)
+        return len(rows)
+
+    updated = requested = 0
+    if cat_ids is not None:
+        ids = sorted(set(cat_ids))
+        requested = len(ids)
+        for i in range(0, len(ids), MODERATION_CHUNK):
+            chunk = ids[i:i + MODERATION_CHUNK]
+            updated += run(update(Cat).where(Cat.id.in_(chunk), Cat.status == "pending"))
+    elif litter_id is not None:
+        requested = updated = run(
+            update(Cat).where(Cat.status == "pending", Cat.litter_id == litter_id)
+        )
+    else:
+        requested = updated = run(
+            update(Cat).where(Cat.status == "pending", Cat.id <= max_id)
+        )
+    apply_stat_deltas(deltas)
+    return updated, requested - updated
+
+@bp.route("/admin/cats/moderate", methods=["POST"])
+@admin_required
+def admin_cats_moderate():
+    action = request.form.get("action")
+    scope = request.form.get("scope", "selected")
+    wants_json = request.accept_mimetypes.best == "application/json"
+    if action not in MODERATION_STATUS:
+        if wants_json:
+            return jsonify({"error": "invalid action"}), 400
+        flash("Ação inválida.", "danger")
+        return redirect(url_for("main.admin_home"))
+
+    if scope == "all":
+        max_id = request.form.get("max_id", type=int) or 0
+        updated, skipped = moderate_pending(action, max_id=max_id)
+    elif scope == "litter":
+        litter_id = request.form.get("litter_id", type=int)
+        if litter_id is None:
+            if wants_json:
+                return jsonify({"error": "litter_id required"}), 400
+            flash("Ninhada inválida.", "warning")
+            return redirect(url_for("main.admin_home"))
+        updated, skipped = moderate_pending(action, litter_id=litter_id)
+    else:
+        cat_ids = request.form.getlist("cat_ids", type=int)
+        if not cat_ids:
+            if wants_json:
+                return jsonify({"error": "no cats selected"}), 400
+            flash("Selecione ao menos um gato.", "warning")
+            return redirect(url_for("main.admin_home"))
+        updated, skipped = moderate_pending(action, cat_ids=cat_ids)
+    db.session.commit()
+    _invalidate_counts("cats")
+
+    if wants_json:
+        return jsonify({"action": action, "updated": updated, "skipped": skipped})
+    verb = "aprovados" if action == "approve" else "rejeitados"
+    msg = f"{updated} cadastros {verb}."
+    if skipped:
+        msg += f" {skipped} já haviam sido moderados ou não existem mais."
+    flash(msg, "success" if updated else "warning")
+    return redirect(url_for("main.admin_home"))
+
+# ------------------------------------------------------------------------------
+# Admin - Estatísticas (lidas de cat_stats, sem COUNT(*) em cats)
+# ------------------------------------------------------------------------------
+@bp.route("/admin/stats")
+@read_only
+@admin_required
+def admin_stats():
+    stats = cat_stats_summary(weeks=request.args.get("weeks", STATS_WEEKS, type=int))
+    if request.args.get("format") == "json" or request.accept_mimetypes.best == "application/json":
+        return jsonify(stats)
+    return render_template("admin_stats.html", stats=stats)
 
 # ------------------------------------------------------------------------------
 # Admin - Lista/ filtros / edição / exclusão de gatos
 # ------------------------------------------------------------------------------
-@app.route("/admin/cats")
+def _cat_filters(status, breed_id, owner_id):
+    conds = []
+    if status in {"pending", "approved", "rejected"}:
+        conds.append(Cat.status == status)
+    if breed_id.isdigit():
+        conds.append(Cat.breed_id == int(breed_id))
+    if owner_id.isdigit():
+        conds.append(Cat.owner_id == int(owner_id))
+    return conds
+
+@bp.route("/admin/cats")
+@read_only
 @admin_required
 def admin_cats():
     q = (request.args.get("q") or "").strip()
@@ -407,50 +2568,32 @@ def admin_cats():
     breed_id = (request.args.get("breed_id") or "").strip()
     owner_id = (request.args.get("owner_id") or "").strip()
     page = request.args.get("page", 1, type=int)
+    cursor = request.args.get("cursor") or None
 
-    query = (
-        db.session.query(Cat)
-        .options(joinedload(Cat.owner), joinedload(Cat.breed), joinedload(Cat.color))
-        .order_by(Cat.created_at.desc())
-    )
+    query = db.session.query(Cat.id, Cat.created_at).order_by(Cat.created_at.desc())
 
+    score = None
     if q:
-        like = f"%{q}%"
-        query = query.join(User, Cat.owner).filter(
-            or_(
-                Cat.name.ilike(like),
-                Cat.microchip.ilike(like),
-                Cat.registry_number.ilike(like),
-                User.name.ilike(like),
-            )
-        )
-
-    if status in {"pending", "approved", "rejected"}:
-        query = query.filter(Cat.status == status)
-
-    if breed_id.isdigit():
-        query = query.filter(Cat.breed_id == int(breed_id))
+        query, score = _search_cats(query, q)
 
-    if owner_id.isdigit():
-        query = query.filter(Cat.owner_id == int(owner_id))
+    query = query.filter(*_cat_filters(status, breed_id, owner_id))
 
-    items, pagination = _paginate(query, page, per_page=20)
+    count_key = ("cats", q, status, breed_id, owner_id)
+    if score is not None:
+        # busca indexada: resultados por relevância, depois mais recentes
+        keys, pagination = _paginate_keyset(
+            query, (score, Cat.id), cursor=cursor, page=page, per_page=20,
+            count_key=count_key, key_of=lambda r: (r.score, r.id),
+        )
+    else:
+        keys, pagination = _paginate_keyset(
+            query, (Cat.created_at, Cat.id), cursor=cursor, page=page, per_page=20,
+            count_key=count_key,
+        )
+    rows = cat_list_rows([k.id for k in keys], with_owner=True)
 
-    rows = []
-    for c in items:
-        rows.append({
-            "id": c.id,
-            "name": c.name,
-            "owner_name": c.owner.name if c.owner else "-",
-            "breed_name": c.breed.name if c.breed else None,
-            "color_name": c.color.name if c.color else None,
-            "ems_code": c.color.ems_code if c.color else None,
-            "dob": c.dob.isoformat() if c.dob else None,
-            "status": c.status,
-        })
-
-    breeds = db.session.query(Breed).order_by(Breed.name.asc()).all()
-    users  = db.session.query(User).order_by(User.name.asc()).all()
+    breeds = ref_breeds()
+    owner = db.session.get(User, int(owner_id)) if owner_id.isdigit() else None
 
     return render_template(
         "admin_cats.html",
@@ -460,20 +2603,48 @@ def admin_cats():
         breed_id=breed_id,
         owner_id=owner_id,
         breeds=breeds,
-        users=users,
+        owner_name=owner.name if owner else "",
         pagination=pagination,
     )
 
-@app.route("/admin/cats/<int:cat_id>/edit", methods=["GET", "POST"])
+@bp.route("/admin/cats/<int:cat_id>/edit", methods=["GET", "POST"])
 @admin_required
 def admin_cat_edit(cat_id):
     cat = db.session.get(Cat, cat_id)
     if not cat:
         flash("Gato não encontrado.", "warning")
-        return redirect(url_for("admin_cats"))
+        return redirect(url_for("main.admin_cats"))
 
     if request.method == "POST":
-        cat.owner_id = request.form.get("owner_id", type=int)
+        sire_id = request.form.get("sire_id", type=int)
+        dam_id = request.form.get("dam_id", type=int)
+        owner_id = request.form.get("owner_id", type=int)
+        error = _parents_error(cat.id, sire_id, dam_id)
+        if not owner_id or db.session.get(User, owner_id) is None:
+            error = "Selecione um dono válido."
+        errors = [error] if error else []
+        refs = _reference_ids(request.form)
+        errors += reference_errors(refs)
+        registry_entity = registry_entity_value(request.form.get("registry_entity"))
+        if request.form.get("status") != "rejected":
+            errors += duplicate_errors(find_duplicates(
+                request.form.get("microchip"), registry_entity,
+                request.form.get("registry_number"), exclude_id=cat.id,
+            ), show_ids=True)
+        if errors:
+            for error in errors:
+                flash(error, "warning")
+            # reexibe o que o admin digitou, sem tocar no objeto da sessão
+            form_cat = dict(
+                request.form.items(), **refs, id=cat.id,
+                owner_id=owner_id, sire_id=sire_id, dam_id=dam_id,
+                owner=db.session.get(User, owner_id) if owner_id else None,
+                sire=db.session.get(Cat, sire_id) if sire_id else None,
+                dam=db.session.get(Cat, dam_id) if dam_id else None,
+            )
+            return _render_admin_cat_form(form_cat, coi=None)
+
+        cat.owner_id = owner_id
         cat.name = (request.form.get("name") or "").strip()
         cat.dob  = _parse_date(request.form.get("dob"))
         cat.sex  = request.form.get("sex") or None
@@ -481,58 +2652,63 @@ def admin_cat_edit(cat_id):
         cat.microchip = request.form.get("microchip") or None
         cat.status = request.form.get("status") or "pending"
 
-        cat.breed_id = request.form.get("breed_id", type=int)
-        cat.color_id = request.form.get("color_id", type=int)
+        for field, value in refs.items():  # raça/cor do gato e dos pais
+            setattr(cat, field, value)
 
         cat.registry_number = request.form.get("registry_number") or None
-        cat.registry_entity = request.form.get("registry_entity") or None
+        cat.registry_entity = registry_entity
 
         cat.breeder_type = request.form.get("breeder_type") or None
         cat.breeder_name = request.form.get("breeder_name") or None
 
         cat.sire_name = request.form.get("sire_name") or None
-        cat.sire_breed_id = request.form.get("sire_breed_id", type=int)
-        cat.sire_color_id = request.form.get("sire_color_id", type=int)
         cat.dam_name = request.form.get("dam_name") or None
-        cat.dam_breed_id = request.form.get("dam_breed_id", type=int)
-        cat.dam_color_id = request.form.get("dam_color_id", type=int)
+        cat.sire_id = sire_id
+        cat.dam_id = dam_id
 
         db.session.commit()
+        _invalidate_counts("cats")
         flash("Gato atualizado com sucesso.", "success")
-        return redirect(url_for("admin_cats"))
+        return redirect(url_for("main.admin_cats"))
 
-    breeds = db.session.query(Breed).order_by(Breed.name.asc()).all()
-    users  = db.session.query(User).order_by(User.name.asc()).all()
-    colors = []
-    if cat.breed_id:
-        colors = (
-            db.session.query(Color)
-            .filter(Color.breed_id == cat.breed_id)
-            .order_by(Color.name.asc())
-            .all()
-        )
+    coi = cat_coi(cat.id) if (cat.sire_id and cat.dam_id) else None
+    return _render_admin_cat_form(cat, coi=coi)
 
+def _render_admin_cat_form(cat, coi):
+    """`cat` é o modelo (GET) ou um dict com os valores enviados (POST com erro)."""
+    breeds = ref_breeds()
+    breed_id = cat["breed_id"] if isinstance(cat, dict) else cat.breed_id
+    colors = ref_colors(breed_id) if breed_id in {b.id for b in breeds} else ()
     return render_template(
         "admin_cat_form.html",
-        cat=cat, breeds=breeds, users=users, colors=colors
+        cat=cat, breeds=breeds, colors=colors,
+        coi=coi, coi_generations=PEDIGREE_GENERATIONS,
     )
 
-@app.route("/admin/cats/<int:cat_id>/delete", methods=["POST"])
+@bp.route("/admin/cats/<int:cat_id>/delete", methods=["POST"])
 @admin_required
 def admin_cat_delete(cat_id):
     cat = db.session.get(Cat, cat_id)
     if not cat:
         flash("Gato não encontrado.", "warning")
-        return redirect(url_for("admin_cats"))
+        return redirect(url_for("main.admin_cats"))
+    # filhotes continuam cadastrados, só perdem o vínculo com este gato
+    for col in (Cat.sire_id, Cat.dam_id):
+        db.session.execute(
+            update(Cat).where(col == cat.id).values({col.key: None})
+            .execution_options(synchronize_session=False)
+        )
     db.session.delete(cat)
     db.session.commit()
+    _invalidate_counts("cats")
     flash("Gato excluído.", "success")
-    return redirect(url_for("admin_cats"))
+    return redirect(url_for("main.admin_cats"))
 
 # ------------------------------------------------------------------------------
 # Admin - Raças & Cores (CRUD + import CSV)
 # ------------------------------------------------------------------------------
-@app.route("/admin/breeds")
+@bp.route("/admin/breeds")
+@read_only
 @admin_required
 def admin_breeds():
     q = (request.args.get("q") or "").strip()
@@ -543,7 +2719,7 @@ def admin_breeds():
     breeds = query.all()
     return render_template("admin_breeds.html", breeds=breeds, q=q)
 
-@app.route("/admin/breeds/new", methods=["GET", "POST"])
+@bp.route("/admin/breeds/new", methods=["GET", "POST"])
 @admin_required
 def admin_breed_new():
     if request.method == "POST":
@@ -556,18 +2732,19 @@ def admin_breed_new():
             return render_template("admin_breed_form.html", mode="new", breed=None)
         b = Breed(name=name)
         db.session.add(b)
+        bump_ref_version()
         db.session.commit()
         flash("Raça criada.", "success")
-        return redirect(url_for("admin_breeds"))
+        return redirect(url_for("main.admin_breeds"))
     return render_template("admin_breed_form.html", mode="new", breed=None)
 
-@app.route("/admin/breeds/<int:breed_id>/edit", methods=["GET", "POST"])
+@bp.route("/admin/breeds/<int:breed_id>/edit", methods=["GET", "POST"])
 @admin_required
 def admin_breed_edit(breed_id):
     b = db.session.get(Breed, breed_id)
     if not b:
         flash("Raça não encontrada.", "warning")
-        return redirect(url_for("admin_breeds"))
+        return redirect(url_for("main.admin_breeds"))
     if request.method == "POST":
         name = (request.form.get("name") or "").strip()
         if not name:
@@ -583,32 +2760,65 @@ def admin_breed_edit(breed_id):
             flash("Já existe uma raça com esse nome.", "warning")
             return render_template("admin_breed_form.html", mode="edit", breed=b)
         b.name = name
+        bump_ref_version()
         db.session.commit()
         flash("Raça atualizada.", "success")
-        return redirect(url_for("admin_breeds"))
+        return redirect(url_for("main.admin_breeds"))
     return render_template("admin_breed_form.html", mode="edit", breed=b)
 
-@app.route("/admin/breeds/<int:breed_id>/delete", methods=["POST"])
+def _count_cats_using(breed_id=None, color_ids=()):
+    """Gatos que referenciam a raça ou as cores (próprias ou dos pais)."""
+    conds = []
+    if breed_id is not None:
+        conds += [Cat.breed_id == breed_id, Cat.sire_breed_id == breed_id, Cat.dam_breed_id == breed_id]
+    if color_ids:
+        conds += [Cat.color_id.in_(color_ids), Cat.sire_color_id.in_(color_ids),
+                  Cat.dam_color_id.in_(color_ids)]
+    if not conds:
+        return 0
+    return db.session.query(func.count(Cat.id)).filter(or_(*conds)).scalar()
+
+@bp.route("/admin/breeds/<int:breed_id>/delete", methods=["POST"])
 @admin_required
 def admin_breed_delete(breed_id):
     b = db.session.get(Breed, breed_id)
     if not b:
         flash("Raça não encontrada.", "warning")
-        return redirect(url_for("admin_breeds"))
-    # apaga também as cores vinculadas
-    db.session.query(Color).filter(Color.breed_id == b.id).delete()
+        return redirect(url_for("main.admin_breeds"))
+    job = enqueue_job("breed_delete", {"breed_id": b.id, "name": b.name}, created_by=g.user.id)
+    flash(f"Exclusão da raça {b.name} enviada para processamento (job #{job.id}).", "info")
+    return redirect(url_for("main.admin_jobs"))
+
+@job_handler("breed_delete")
+def _breed_delete_job(run):
+    """Apaga as cores da raça em lotes (um commit por lote) e depois a raça."""
+    b = db.session.get(Breed, run.payload["breed_id"])
+    if b is None:
+        return {"breed": run.payload.get("name"), "deleted_colors": 0, "already_deleted": True}
+    color_ids = [cid for (cid,) in db.session.query(Color.id).filter(Color.breed_id == b.id)]
+    in_use = _count_cats_using(breed_id=b.id, color_ids=color_ids)
+    if in_use:
+        raise JobFailed(f"Raça em uso por {in_use} gato(s); altere-os antes de excluir.")
+    total = len(color_ids)
+    run.progress(0, total + 1)
+    for i in range(0, total, JOB_CHUNK):
+        chunk = color_ids[i:i + JOB_CHUNK]
+        db.session.query(Color).filter(Color.id.in_(chunk)).delete(synchronize_session=False)
+        bump_ref_version()
+        run.progress(i + len(chunk))
+    name = b.name
     db.session.delete(b)
-    db.session.commit()
-    flash("Raça excluída.", "success")
-    return redirect(url_for("admin_breeds"))
+    bump_ref_version()
+    run.progress(total + 1)
+    return {"breed": name, "deleted_colors": total}
 
-@app.route("/admin/breeds/<int:breed_id>/colors")
+@bp.route("/admin/breeds/<int:breed_id>/colors")
 @admin_required
 def admin_colors(breed_id):
     b = db.session.get(Breed, breed_id)
     if not b:
         flash("Raça não encontrada.", "warning")
-        return redirect(url_for("admin_breeds"))
+        return redirect(url_for("main.admin_breeds"))
     colors = (
         db.session.query(Color)
         .filter(Color.breed_id == b.id)
@@ -617,119 +2827,393 @@ def admin_colors(breed_id):
     )
     return render_template("admin_colors.html", breed=b, colors=colors)
 
-@app.route("/admin/breeds/<int:breed_id>/colors/new", methods=["GET", "POST"])
+@bp.route("/admin/breeds/<int:breed_id>/colors/new", methods=["GET", "POST"])
 @admin_required
 def admin_color_new(breed_id):
     b = db.session.get(Breed, breed_id)
     if not b:
         flash("Raça não encontrada.", "warning")
-        return redirect(url_for("admin_breeds"))
+        return redirect(url_for("main.admin_breeds"))
     if request.method == "POST":
         name = (request.form.get("name") or "").strip()
         ems  = (request.form.get("ems_code") or "").strip()
         if not name or not ems:
             flash("Informe nome da cor e EMS.", "warning")
             return render_template("admin_color_form.html", mode="new", breed_id=b.id, color=None)
+        if db.session.query(Color).filter(Color.breed_id == b.id, Color.name == name).first():
+            flash("Essa cor já existe para esta raça.", "warning")
+            return render_template("admin_color_form.html", mode="new", breed_id=b.id, color=None)
         c = Color(breed_id=b.id, name=name, ems_code=ems)
         db.session.add(c)
+        bump_ref_version()
         db.session.commit()
         flash("Cor criada.", "success")
-        return redirect(url_for("admin_colors", breed_id=b.id))
+        return redirect(url_for("main.admin_colors", breed_id=b.id))
     return render_template("admin_color_form.html", mode="new", breed_id=b.id, color=None)
 
-@app.route("/admin/colors/<int:color_id>/edit", methods=["GET", "POST"])
+@bp.route("/admin/colors/<int:color_id>/edit", methods=["GET", "POST"])
 @admin_required
 def admin_color_edit(color_id):
     c = db.session.get(Color, color_id)
     if not c:
         flash("Cor não encontrada.", "warning")
-        return redirect(url_for("admin_breeds"))
+        return redirect(url_for("main.admin_breeds"))
     if request.method == "POST":
         name = (request.form.get("name") or "").strip()
         ems  = (request.form.get("ems_code") or "").strip()
         if not name or not ems:
             flash("Informe nome da cor e EMS.", "warning")
             return render_template("admin_color_form.html", mode="edit", breed_id=c.breed_id, color=c)
+        exists = (
+            db.session.query(Color)
+            .filter(Color.breed_id == c.breed_id, Color.name == name, Color.id != c.id)
+            .first()
+        )
+        if exists:
+            flash("Já existe uma cor com esse nome nesta raça.", "warning")
+            return render_template("admin_color_form.html", mode="edit", breed_id=c.breed_id, color=c)
         c.name = name
         c.ems_code = ems
+        bump_ref_version()
         db.session.commit()
         flash("Cor atualizada.", "success")
-        return redirect(url_for("admin_colors", breed_id=c.breed_id))
+        return redirect(url_for("main.admin_colors", breed_id=c.breed_id))
     return render_template("admin_color_form.html", mode="edit", breed_id=c.breed_id, color=c)
 
-@app.route("/admin/colors/<int:color_id>/delete", methods=["POST"])
+@bp.route("/admin/colors/<int:color_id>/delete", methods=["POST"])
 @admin_required
 def admin_color_delete(color_id):
     c = db.session.get(Color, color_id)
     if not c:
         flash("Cor não encontrada.", "warning")
-        return redirect(url_for("admin_breeds"))
+        return redirect(url_for("main.admin_breeds"))
     breed_id = c.breed_id
+    in_use = _count_cats_using(color_ids=[c.id])
+    if in_use:
+        flash(f"Cor em uso por {in_use} gato(s); altere-os antes de excluir.", "warning")
+        return redirect(url_for("main.admin_colors", breed_id=breed_id))
     db.session.delete(c)
+    bump_ref_version()
     db.session.commit()
     flash("Cor excluída.", "success")
-    return redirect(url_for("admin_colors", breed_id=breed_id))
+    return redirect(url_for("main.admin_colors", breed_id=breed_id))
+
+IMPORT_BATCH_SIZE = 1000
+IMPORT_REPORT_LIMIT = 500  # linhas exibidas no relatório (contagens são totais)
+
+def _ensure_color_uniqueness():
+    """Garante UNIQUE(breed_id, name) em colors, também em bancos antigos.
+
+    Importações anteriores podiam duplicar cores; as duplicatas são
+    fundidas na de menor id (repontando os gatos) antes de criar o índice.
+    """
+    insp = inspect(db.session.connection())
+    uniques = [u["column_names"] for u in insp.get_unique_constraints("colors")]
+    uniques += [i["column_names"] for i in insp.get_indexes("colors") if i["unique"]]
+    if any(set(cols) == {"breed_id", "name"} for cols in uniques):
+        return
+    dups = db.session.execute(text(
+        "SELECT breed_id, name, MIN(id) FROM colors "
+        "GROUP BY breed_id, name HAVING COUNT(*) > 1"
+    )).all()
+    for breed_id, name, keep_id in dups:
+        params = {"b": breed_id, "n": name, "keep": keep_id}
+        dup_ids = "SELECT id FROM colors WHERE breed_id = :b AND name = :n AND id <> :keep"
+        for col in ("color_id", "sire_color_id", "dam_color_id"):
+            db.session.execute(text(
+                f"UPDATE cats SET {col} = :keep WHERE {col} IN ({dup_ids})"
+            ), params)
+        db.session.execute(text(f"DELETE FROM colors WHERE id IN ({dup_ids})"), params)
+    db.session.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_colors_breed_name ON colors (breed_id, name)"
+    ))
+
+def _upsert_colors(rows):
+    stmt = _dialect_insert(db.engine.dialect.name)(Color.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["breed_id", "name"],
+        set_={"ems_code": stmt.excluded.ems_code},
+    )
+    db.session.execute(stmt, rows)
+
+def import_colors_csv(stream, batch_size=IMPORT_BATCH_SIZE, on_batch=None):
+    """Importa cores de um CSV (cabeçalho: breed,color,ems) em lotes.
+
+    Lê o arquivo em streaming, resolve raças por um dicionário carregado
+    uma única vez e grava com INSERT ... ON CONFLICT DO UPDATE. Não faz
+    commit; `on_batch(report)`, se informado, é chamado após cada lote
+    gravado. Devolve um relatório com contagens por situação e as linhas
+    (limitadas a IMPORT_REPORT_LIMIT) que não foram simplesmente inseridas.
+    """
+    text_stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    reader = csv.reader(text_stream)
+    header = [h.strip().lower() for h in next(reader, [])]
+    try:
+        i_breed, i_color, i_ems = (header.index(k) for k in ("breed", "color", "ems"))
+    except ValueError:
+        raise ValueError("cabeçalho deve conter as colunas breed, color e ems")
+
+    _ensure_color_uniqueness()
+    breeds = {name.lower(): bid for bid, name in db.session.query(Breed.id, Breed.name)}
+    existing = {
+        (bid, name): ems
+        for bid, name, ems in db.session.query(Color.breed_id, Color.name, Color.ems_code)
+    }
 
-@app.route("/admin/colors/import", methods=["GET", "POST"])
+    report = {"inserted": 0, "updated": 0, "skipped": 0, "invalid": 0,
+              "new_breeds": 0, "rows": []}
+
+    def note(line, status, breed, color, detail=""):
+        report[status] += 1
+        if status != "inserted" and len(report["rows"]) < IMPORT_REPORT_LIMIT:
+            report["rows"].append({"line": line, "status": status, "breed": breed,
+                                   "color": color, "detail": detail})
+
+    batch = {}
+    width = max(i_breed, i_color, i_ems) + 1
+    for line, row in enumerate(reader, start=2):
+        if not any(cell.strip() for cell in row):
+            continue
+        if len(row) < width:
+            note(line, "invalid", "", "", "colunas faltando")
+            continue
+        breed_name = row[i_breed].strip()
+        color_name = row[i_color].strip()
+        ems_code   = row[i_ems].strip()
+        if not breed_name or not color_name or not ems_code:
+            note(line, "invalid", breed_name, color_name, "raça, cor e EMS são obrigatórios")
+            continue
+
+        breed_id = breeds.get(breed_name.lower())
+        if breed_id is None:
+            breed = Breed(name=breed_name)
+            db.session.add(breed)
+            db.session.flush()
+            breed_id = breeds[breed_name.lower()] = breed.id
+            report["new_breeds"] += 1
+
+        key = (breed_id, color_name)
+        if key in existing:
+            if existing[key] == ems_code:
+                note(line, "skipped", breed_name, color_name, "sem alterações")
+                continue
+            note(line, "updated", breed_name, color_name, f"EMS {existing[key]} → {ems_code}")
+        else:
+            note(line, "inserted", breed_name, color_name)
+        existing[key] = ems_code
+        batch[key] = {"breed_id": breed_id, "name": color_name, "ems_code": ems_code}
+        if len(batch) >= batch_size:
+            _upsert_colors(list(batch.values()))
+            batch.clear()
+            if on_batch:
+                on_batch(report)
+
+    if batch:
+        _upsert_colors(list(batch.values()))
+    text_stream.detach()
+    return report
+
+@bp.route("/admin/colors/import", methods=["GET", "POST"])
 @admin_required
 def admin_colors_import():
     if request.method == "POST":
         f = request.files.get("file")
-        if not f:
+        if not f or not f.filename:
             flash("Envie um arquivo CSV.", "warning")
             return render_template("admin_colors_import.html")
-        try:
-            # CSV com cabeçalho: breed,color,ems
-            # Atenção ao encoding: tente 'utf-8-sig' p/ arquivos do Excel
-            stream = (f.stream.read()).decode("utf-8-sig").splitlines()
-            reader = csv.DictReader(stream)
-            add_count = 0
-            for row in reader:
-                breed_name = (row.get("breed") or "").strip()
-                color_name = (row.get("color") or "").strip()
-                ems_code   = (row.get("ems") or "").strip()
-                if not breed_name or not color_name or not ems_code:
-                    continue
-                breed = db.session.query(Breed).filter(func.lower(Breed.name)==breed_name.lower()).first()
-                if not breed:
-                    breed = Breed(name=breed_name)
-                    db.session.add(breed)
-                    db.session.flush()
-                color = Color(breed_id=breed.id, name=color_name, ems_code=ems_code)
-                db.session.add(color)
-                add_count += 1
-            db.session.commit()
-            flash(f"Importação concluída. {add_count} cores adicionadas.", "success")
-            return redirect(url_for("admin_breeds"))
-        except Exception as e:
-            db.session.rollback()
-            flash(f"Falha ao importar: {e}", "danger")
-            return render_template("admin_colors_import.html")
+        os.makedirs(JOB_SPOOL_DIR, exist_ok=True)
+        path = os.path.join(JOB_SPOOL_DIR, f"colors-{uuid.uuid4().hex}.csv")
+        f.save(path)
+        job = enqueue_job("colors_import", {"path": path, "filename": f.filename},
+                          created_by=g.user.id)
+        flash(f"Arquivo recebido; importação em processamento (job #{job.id}).", "info")
+        return redirect(url_for("main.admin_colors_import", job=job.id))
+
+    job = None
+    job_id = request.args.get("job", type=int)
+    if job_id:
+        job = db.session.get(Job, job_id)
+        job = _job_json(job) if job and job.kind == "colors_import" else None
+    return render_template("admin_colors_import.html", job=job,
+                           report=job["result"] if job and job["status"] == "done" else None)
+
+@job_handler("colors_import")
+def _colors_import_job(run):
+    """Importa o CSV salvo no spool, com commit e progresso (bytes lidos) por lote."""
+    path = run.payload["path"]
+    if not os.path.exists(path):
+        raise JobFailed("arquivo da importação não encontrado")
+    total = os.path.getsize(path)
+    try:
+        with open(path, "rb") as fh:
+            def on_batch(report):
+                bump_ref_version()
+                run.progress(fh.tell(), total)
+            try:
+                report = import_colors_csv(fh, batch_size=JOB_CHUNK, on_batch=on_batch)
+            except ValueError as e:
+                raise JobFailed(str(e))
+        bump_ref_version()
+        run.progress(total, total)
+    except Exception as e:
+        # falha definitiva: ninguém vai reler o arquivo, então sai do spool
+        if isinstance(e, JobFailed) or run.last_attempt:
+            os.remove(path)
+        raise
+    os.remove(path)
+    return report
+
+# ------------------------------------------------------------------------------
+# Admin - Jobs (acompanhamento)
+# ------------------------------------------------------------------------------
+JOB_KIND_LABELS = {"colors_import": "Importação de cores", "breed_delete": "Exclusão de raça"}
 
-    return render_template("admin_colors_import.html")
+@bp.route("/admin/jobs")
+@admin_required
+def admin_jobs():
+    jobs = db.session.query(Job).order_by(Job.id.desc()).limit(50).all()
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify([_job_json(j) for j in jobs])
+    return render_template("admin_jobs.html", jobs=[_job_json(j) for j in jobs],
+                           labels=JOB_KIND_LABELS)
+
+@bp.route("/admin/jobs/<int:job_id>")
+@admin_required
+def admin_job_status(job_id):
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return jsonify({"error": "job not found"}), 404
+    return jsonify(_job_json(job))
 
 # ------------------------------------------------------------------------------
-# Admin - Usuários (lista/busca/filtro/editar/excluir/reset)
+# Admin - Exportação (CSV / NDJSON em streaming)
 # ------------------------------------------------------------------------------
-@app.route("/admin/users")
+# As linhas saem de um SELECT de colunas com joins explícitos (sem hidratar
+# objetos ORM nem lazy loads), lidas em lotes de EXPORT_BATCH com yield_per
+# (cursor do lado do servidor no Postgres) e escritas por um gerador: a
+# memória fica constante, seja qual for o tamanho da exportação.
+EXPORT_BATCH = 1000
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+def _export_value(v):
+    if isinstance(v, (dt.date, dt.datetime)):
+        return v.isoformat()
+    return v
+
+def _stream_export(stmt, fmt, basename):
+    columns = [c.name for c in stmt.selected_columns]
+
+    def generate():
+        result = db.session.execute(stmt.execution_options(yield_per=EXPORT_BATCH))
+        if fmt == "csv":
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            writer.writerow(columns)
+            for batch in result.partitions():
+                writer.writerows([_export_value(v) for v in row] for row in batch)
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+            yield buf.getvalue()
+        else:
+            for batch in result.partitions():
+                yield "".join(
+                    json.dumps(dict(zip(columns, map(_export_value, row))), ensure_ascii=False) + "\n"
+                    for row in batch
+                )
+
+    filename = f"{basename}-{dt.date.today().isoformat()}.{fmt}"
+    return current_app.response_class(
+        stream_with_context(generate()),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@bp.route("/admin/cats/export")
 @admin_required
-def admin_users():
+def admin_cats_export():
+    fmt = request.args.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        flash("Formato de exportação inválido.", "warning")
+        return redirect(url_for("main.admin_cats"))
+    q = (request.args.get("q") or "").strip()
+    status = (request.args.get("status") or "").strip()
+    breed_id = (request.args.get("breed_id") or "").strip()
+    owner_id = (request.args.get("owner_id") or "").strip()
+
+    stmt = (
+        select(
+            Cat.id, Cat.name,
+            User.name.label("owner_name"), User.email.label("owner_email"),
+            Breed.name.label("breed_name"), Color.name.label("color_name"), Color.ems_code,
+            Cat.dob, Cat.sex, Cat.neutered, Cat.microchip,
+            Cat.registry_number, Cat.registry_entity, Cat.breeder_type, Cat.breeder_name,
+            Cat.sire_name, Cat.dam_name, Cat.status, Cat.created_at,
+        )
+        .join(User, User.id == Cat.owner_id)
+        .outerjoin(Breed, Breed.id == Cat.breed_id)
+        .outerjoin(Color, Color.id == Cat.color_id)
+        .where(*_cat_filters(status, breed_id, owner_id))
+        .order_by(Cat.created_at.desc(), Cat.id.desc())
+    )
+    if q:
+        stmt = stmt.where(cat_search_condition(q))
+    return _stream_export(stmt, fmt, "gatos")
+
+@bp.route("/admin/users/export")
+@admin_required
+def admin_users_export():
+    fmt = request.args.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        flash("Formato de exportação inválido.", "warning")
+        return redirect(url_for("main.admin_users"))
     q = (request.args.get("q") or "").strip()
     is_admin = request.args.get("is_admin", "")
-    page = request.args.get("page", 1, type=int)
 
-    query = db.session.query(User).order_by(User.created_at.desc())
+    stmt = (
+        select(
+            User.id, User.name, User.email, User.dob, User.sex, User.cpf, User.phone,
+            User.address, User.address2, User.district, User.city, User.state,
+            User.zipcode, User.country, User.is_admin, User.created_at,
+        )
+        .where(*_user_filters(q, is_admin))
+        .order_by(User.created_at.desc(), User.id.desc())
+    )
+    return _stream_export(stmt, fmt, "usuarios")
 
+# ------------------------------------------------------------------------------
+# Admin - Usuários (lista/busca/filtro/editar/excluir/reset)
+# ------------------------------------------------------------------------------
+def _user_filters(q, is_admin):
+    conds = []
     if q:
         like = f"%{q}%"
-        query = query.filter(or_(User.name.ilike(like), User.email.ilike(like)))
-
+        conds.append(or_(User.name.ilike(like), User.email.ilike(like)))
     if is_admin == "1":
-        query = query.filter(User.is_admin.is_(True))
+        conds.append(User.is_admin.is_(True))
     elif is_admin == "0":
-        query = query.filter(User.is_admin.is_(False))
+        conds.append(User.is_admin.is_(False))
+    return conds
 
-    items, pagination = _paginate(query, page, per_page=20)
+@bp.route("/admin/users")
+@read_only
+@admin_required
+def admin_users():
+    q = (request.args.get("q") or "").strip()
+    is_admin = request.args.get("is_admin", "")
+    page = request.args.get("page", 1, type=int)
+    cursor = request.args.get("cursor") or None
+
+    query = (
+        db.session.query(User)
+        .filter(*_user_filters(q, is_admin))
+        .order_by(User.created_at.desc())
+    )
+
+    items, pagination = _paginate_keyset(
+        query, (User.created_at, User.id), cursor=cursor, page=page, per_page=20,
+        count_key=("users", q, is_admin),
+    )
 
     rows = [{
         "id": u.id,
@@ -744,13 +3228,13 @@ def admin_users():
         users=rows, q=q, is_admin=is_admin, pagination=pagination
     )
 
-@app.route("/admin/users/<int:user_id>/edit", methods=["GET", "POST"])
+@bp.route("/admin/users/<int:user_id>/edit", methods=["GET", "POST"])
 @admin_required
 def admin_user_edit(user_id):
     u = db.session.get(User, user_id)
     if not u:
         flash("Usuário não encontrado.", "warning")
-        return redirect(url_for("admin_users"))
+        return redirect(url_for("main.admin_users"))
 
     if request.method == "POST":
         u.name = (request.form.get("name") or "").strip()
@@ -769,64 +3253,69 @@ def admin_user_edit(user_id):
         u.is_admin = bool(request.form.get("is_admin"))
 
         db.session.commit()
+        _forget_principal(u.id)
+        _invalidate_counts("users")
         flash("Usuário atualizado com sucesso.", "success")
-        return redirect(url_for("admin_users"))
+        return redirect(url_for("main.admin_users"))
 
     return render_template("admin_user_form.html", u=u)
 
-@app.route("/admin/users/<int:user_id>/delete", methods=["POST"])
+@bp.route("/admin/users/<int:user_id>/delete", methods=["POST"])
 @admin_required
 def admin_user_delete(user_id):
     if g.user and g.user.id == user_id:
         flash("Você não pode excluir a si mesmo enquanto está logado.", "warning")
-        return redirect(url_for("admin_users"))
+        return redirect(url_for("main.admin_users"))
     u = db.session.get(User, user_id)
     if not u:
         flash("Usuário não encontrado.", "warning")
-        return redirect(url_for("admin_users"))
+        return redirect(url_for("main.admin_users"))
     db.session.delete(u)
     db.session.commit()
+    _forget_principal(user_id)
+    _invalidate_counts("users")
+    _invalidate_counts("cats")
     flash("Usuário excluído.", "success")
-    return redirect(url_for("admin_users"))
+    return redirect(url_for("main.admin_users"))
 
-@app.route("/admin/users/<int:user_id>/reset", methods=["POST"])
+@bp.route("/admin/users/<int:user_id>/reset", methods=["POST"])
 @admin_required
 def admin_user_reset_password(user_id):
     u = db.session.get(User, user_id)
     if not u:
         flash("Usuário não encontrado.", "warning")
-        return redirect(url_for("admin_users"))
+        return redirect(url_for("main.admin_users"))
 
     s = _reset_serializer()
     token = s.dumps({"uid": u.id, "email": u.email})
 
     if APP_BASE_URL:
-        reset_url = f"{APP_BASE_URL}{url_for('reset_password', token=token)}"
+        reset_url = f"{APP_BASE_URL}{url_for('main.reset_password', token=token)}"
     else:
-        reset_url = url_for("reset_password", token=token, _external=True)
+        reset_url = url_for("main.reset_password", token=token, _external=True)
 
     flash(f"Link de reset de senha: {reset_url}", "info")
-    return redirect(url_for("admin_users"))
+    return redirect(url_for("main.admin_users"))
 
 # ------------------------------------------------------------------------------
 # Reset de senha (público, via token)
 # ------------------------------------------------------------------------------
-@app.route("/reset/<token>", methods=["GET", "POST"])
+@bp.route("/reset/<token>", methods=["GET", "POST"])
 def reset_password(token):
     s = _reset_serializer()
     try:
         data = s.loads(token, max_age=86400)  # 24h
     except SignatureExpired:
         flash("Link expirado. Gere um novo link de reset.", "warning")
-        return redirect(url_for("login"))
+        return redirect(url_for("main.login"))
     except BadSignature:
         flash("Link inválido.", "danger")
-        return redirect(url_for("login"))
+        return redirect(url_for("main.login"))
 
     u = db.session.get(User, data.get("uid"))
     if not u or (u.email or "").lower() != (data.get("email") or "").lower():
         flash("Link inválido para este usuário.", "danger")
-        return redirect(url_for("login"))
+        return redirect(url_for("main.login"))
 
     if request.method == "POST":
         p1 = request.form.get("password") or ""
@@ -839,11 +3328,220 @@ def reset_password(token):
             return render_template("reset_password.html")
         u.set_password(p1)
         db.session.commit()
+        _forget_principal(u.id)
         flash("Senha atualizada. Faça login.", "success")
-        return redirect(url_for("login"))
+        return redirect(url_for("main.login"))
 
     return render_template("reset_password.html")
 
+# ------------------------------------------------------------------------------
+# Carga de dados sintéticos (flask seed)
+# ------------------------------------------------------------------------------
+# Raças FIFe e cores de exemplo de seed.py, mais N usuários e M gatos com
+# distribuições plausíveis: poucas raças e cores concentram a maioria dos
+# gatos, poucos donos (criadores) concentram muitos gatos, ninhadas dividem
+# pais/nascimento/dono, e os cadastros recentes ainda estão pendentes. Tudo
+# sai de random.Random(seed): num banco vazio, a mesma semente gera os mesmos
+# dados. A gravação usa executemany direto no driver, em lotes, numa única
+# transação; no SQLite, os índices de `cats` são recriados depois da carga e
+# as PRAGMAs da conexão ficam ajustadas para escrita em massa.
+SEED_BATCH = 50_000
+SEED_PASSWORD = "senha123"
+SEED_REGISTRY = tuple(zip(REGISTRY_ENTITIES, (70, 15, 15)))
+SEED_STATES = ("SP", "RJ", "MG", "PR", "RS", "SC", "BA", "DF", "PE", "GO")
+
+def _cum_weights(weights):
+    total, out = 0, []
+    for w in weights:
+        total += w
+        out.append(total)
+    return out
+
+def _pick(rnd, items, cum):
+    return items[bisect.bisect_right(cum, rnd.random() * cum[-1])]
+
+def _executemany(conn, table_name, columns, rows):
+    mark = "?" if conn.dialect.paramstyle == "qmark" else "%s"
+    sql = (f"INSERT INTO {table_name} ({', '.join(columns)}) "
+           f"VALUES ({', '.join([mark] * len(columns))})")
+    for i in range(0, len(rows), SEED_BATCH):
+        conn.exec_driver_sql(sql, rows[i:i + SEED_BATCH])
+
+def _seed_reference(conn, colors_per_breed):
+    """Raças FIFe e cores (exemplos de seed.py + cores geradas); só insere o
+    que falta. Devolve {breed_id: [color_id, ...]} na ordem de popularidade."""
+    from seed import FIFE_BREEDS, SAMPLE_COLORS
+
+    existing = {name for (name,) in conn.execute(select(Breed.name))}
+    missing = [(n,) for n in FIFE_BREEDS if n not in existing]
+    if missing:
+        _executemany(conn, "breeds", ("name",), missing)
+    breeds = dict(conn.execute(select(Breed.name, Breed.id).where(Breed.name.in_(FIFE_BREEDS))).all())
+    have = {(b, n) for b, n in conn.execute(select(Color.breed_id, Color.name))}
+    rows = []
+    for name, bid in breeds.items():
+        colors = list(SAMPLE_COLORS.get(name, ()))
+        prefix = name.replace(" ", "")[:3].upper()
+        colors += [(f"Color {i:03d}", f"{prefix} {i}") for i in range(colors_per_breed - len(colors))]
+        rows += [(bid, cname, ems) for cname, ems in colors if (bid, cname) not in have]
+    if rows:
+        _executemany(conn, "colors", ("breed_id", "name", "ems_code"), rows)
+    by_breed = {bid: [] for bid in breeds.values()}
+    for cid, bid in conn.execute(select(Color.id, Color.breed_id).order_by(Color.id)):
+        if bid in by_breed:
+            by_breed[bid].append(cid)
+    return {bid: ids for bid, ids in by_breed.items() if ids}
+
+def seed_synthetic(users=0, cats=0, seed=42, colors_per_breed=20, password=SEED_PASSWORD,
+                   email_domain="synthetic.test", start=dt.datetime(2022, 1, 1),
+                   end=dt.datetime(2025, 10, 1)):
+    """Gera a carga sintética e devolve as contagens. Faz commit.
+
+    Índice de busca e cat_stats são reconstruídos ao final.
+    """
+    rnd = random.Random(seed)
+    span = int((end - start).total_seconds())
+    counts = {"users": 0, "cats": 0, "litters": 0, "with_parents": 0}
+    is_sqlite = db.engine.url.get_backend_name() == "sqlite"
+    cat_indexes = sorted(Cat.__table__.indexes, key=lambda idx: idx.name)
+
+    with db.engine.connect() as conn:
+        if is_sqlite:
+            # fora da transação (PRAGMA foreign_keys não muda dentro dela)
+            for pragma in ("foreign_keys=OFF", "synchronous=OFF", "cache_size=-262144"):
+                conn.exec_driver_sql(f"PRAGMA {pragma}")
+        try:
+            colors_by_breed = _seed_reference(conn, colors_per_breed)
+            breed_ids = list(colors_by_breed)
+            # popularidade ~ 1/posição (Zipf): poucas raças e cores dominam
+            breed_order = rnd.sample(breed_ids, len(breed_ids))
+            breed_cum = _cum_weights([1 / (i + 1) for i in range(len(breed_order))])
+            color_cum = {b: _cum_weights([1 / (i + 1) for i in range(len(ids))])
+                         for b, ids in colors_by_breed.items()}
+
+            pw_hash = hash_password(password)  # um hash só: PBKDF2 por usuário levaria minutos
+            first_user = (conn.execute(select(func.max(User.id))).scalar() or 0) + 1
+            user_rows = []
+            for i in range(users):
+                created = start + dt.timedelta(seconds=rnd.randrange(span))
+                name = f"Usuário {i:06d}"
+                user_rows.append((
+                    first_user + i, name, search_key(name), f"user{i}@{email_domain}", pw_hash,
+                    False, rnd.choice(SEED_STATES), "Brasil", created.isoformat(" ", "microseconds"),
+                ))
+            if user_rows:
+                _executemany(conn, "users", ("id", "name", "name_key", "email", "password_hash",
+                                             "is_admin", "state", "country", "created_at"), user_rows)
+            counts["users"] = len(user_rows)
+            owner_ids = [r[0] for r in user_rows] or [
+                uid for (uid,) in conn.execute(select(User.id).order_by(User.id))]
+
+            if cats and owner_ids:
+                if is_sqlite:
+                    for idx in cat_indexes:
+                        conn.exec_driver_sql(f"DROP INDEX IF EXISTS {idx.name}")
+                _seed_cats(conn, rnd, cats, owner_ids, breed_order, breed_cum,
+                           colors_by_breed, color_cum, start, span, counts)
+                if is_sqlite:
+                    for idx in cat_indexes:
+                        conn.execute(CreateIndex(idx, if_not_exists=True))
+            conn.commit()
+        finally:
+            if is_sqlite:
+                for name in ("foreign_keys", "synchronous", "cache_size"):
+                    conn.exec_driver_sql(f"PRAGMA {name}={SQLITE_PRAGMAS[name]}")
+    init_search_index()
+    rebuild_cat_stats()
+    bump_ref_version()
+    db.session.commit()
+    _invalidate_counts("cats")
+    if is_sqlite:
+        # a carga passou inteira pelo WAL; devolve o espaço ao arquivo principal
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    return counts
+
+def _seed_cats(conn, rnd, total, owner_ids, breed_order, breed_cum, colors_by_breed,
+               color_cum, start, span, counts):
+    random_ = rnd.random
+    first_id = (conn.execute(select(func.max(Cat.id))).scalar() or 0) + 1
+    # instantes de cadastro em ordem: ids crescem com created_at e os pais
+    # (sempre de ninhadas anteriores) são mais velhos que os filhotes
+    moments = sorted([int(random_() * span) for _ in range(total)])
+    entities = [e for e, _ in SEED_REGISTRY]
+    entity_cum = _cum_weights([w for _, w in SEED_REGISTRY])
+    males = {b: [] for b in breed_order}
+    females = {b: [] for b in breed_order}
+    n_owners = len(owner_ids)
+    columns = ("id", "owner_id", "breed_id", "color_id", "name", "dob", "sex", "neutered",
+               "microchip", "registry_number", "registry_entity", "breeder_type",
+               "sire_id", "dam_id", "status", "created_at", "microchip_norm", "registry_norm")
+    rows = []
+    i = 0
+    while i < total:
+        breed = _pick(rnd, breed_order, breed_cum)
+        size = min(total - i, 2 + int(random_() * 5)) if random_() < 0.4 else 1
+        # poucos donos (criadores) concentram a maior parte dos gatos
+        owner = owner_ids[int(n_owners * random_() ** 3)]
+        sire = dam = None
+        pool_m, pool_f = males[breed], females[breed]
+        if pool_m and pool_f and random_() < 0.7:
+            # reprodutores recentes da mesma raça
+            sire = pool_m[-1 - int(random_() * min(200, len(pool_m)))]
+            dam = pool_f[-1 - int(random_() * min(200, len(pool_f)))]
+            counts["with_parents"] += size
+        created = start + dt.timedelta(seconds=moments[i])
+        dob = (created - dt.timedelta(days=60 + int(random_() * 2440))).date().isoformat()
+        created_s = created.isoformat(" ", "microseconds")
+        recent = i / total > 0.97
+        if size > 1:
+            counts["litters"] += 1
+        entity = _pick(rnd, entities, entity_cum)
+        breeder_type = "eu mesmo" if size > 1 or random_() < 0.5 else "outro"
+        colors, cum = colors_by_breed[breed], color_cum[breed]
+        for _ in range(size):
+            cid = first_id + i
+            sex = "Macho" if random_() < 0.5 else "Fêmea"
+            r = random_()
+            if recent:
+                status = "pending" if r < 0.6 else ("approved" if r < 0.95 else "rejected")
+            else:
+                status = "approved" if r < 0.88 else ("rejected" if r < 0.95 else "pending")
+            # microchip único e espalhado: o multiplicador é coprimo com
+            # 10**12, então i -> chip é injetiva (e já está normalizado)
+            chip = f"986{(i * 618033988749 + 104729) % 10**12:012d}"
+            registry = f"BR-{i:07d}"
+            rows.append((
+                cid, owner, breed, _pick(rnd, colors, cum), f"Gato {i:07d}", dob, sex,
+                random_() < 0.4, chip, registry, entity, breeder_type, sire, dam, status,
+                created_s, chip, normalize_registry(entity, registry),
+            ))
+            (males if sex == "Macho" else females)[breed].append(cid)
+            i += 1
+        if len(rows) >= SEED_BATCH:
+            _executemany(conn, "cats", columns, rows)
+            counts["cats"] += len(rows)
+            rows = []
+    if rows:
+        _executemany(conn, "cats", columns, rows)
+        counts["cats"] += len(rows)
+
+@bp.cli.command("seed")
+@click.option("--users", type=int, default=0, help="usuários sintéticos")
+@click.option("--cats", type=int, default=0, help="gatos sintéticos")
+@click.option("--seed", "seed_value", type=int, default=42, help="semente (mesma semente, mesmos dados)")
+@click.option("--colors-per-breed", type=int, default=20)
+@click.option("--password", default=SEED_PASSWORD, help="senha de todos os usuários sintéticos")
+def seed_command(users, cats, seed_value, colors_per_breed, password):
+    """Raças FIFe e cores (seed.py) e, opcionalmente, usuários e gatos sintéticos."""
+    upgrade_schema()
+    _ensure_default_admin()
+    t0 = time.perf_counter()
+    counts = seed_synthetic(users, cats, seed_value, colors_per_breed, password)
+    print(f"[seed] {counts['users']} usuários, {counts['cats']} gatos "
+          f"({counts['litters']} ninhadas, {counts['with_parents']} com pais) "
+          f"em {time.perf_counter() - t0:.1f}s")
+
 # ------------------------------------------------------------------------------
 # Inicialização do DB e admin padrão
 # ------------------------------------------------------------------------------
@@ -862,16 +3560,217 @@ def _ensure_default_admin():
         db.session.commit()
         print(f"[setup] Admin criado: {email} / admin123")
 
-@app.cli.command("init-db")
+def upgrade_schema():
+    """Cria tabelas e aplica a bancos existentes o que create_all não cobre.
+
+    Adiciona colunas novas (anuláveis ou com default no servidor) e índices
+    ausentes; é idempotente.
+    """
+    db.create_all()
+    conn = db.session.connection()
+    insp = inspect(conn)
+    for tbl in db.metadata.sorted_tables:
+        existing = {c["name"] for c in insp.get_columns(tbl.name)}
+        for col in tbl.columns:
+            if col.name in existing:
+                continue
+            if not col.nullable and col.server_default is None:
+                print(f"[upgrade] {tbl.name}.{col.name}: coluna obrigatória sem default, ignorada")
+                continue
+            ddl = f"ALTER TABLE {tbl.name} ADD COLUMN {col.name} {col.type.compile(dialect=conn.dialect)}"
+            if col.server_default is not None:
+                ddl += f" DEFAULT {col.server_default.arg}"
+            conn.execute(text(ddl))
+            print(f"[upgrade] coluna {tbl.name}.{col.name} criada")
+        for idx in tbl.indexes:
+            conn.execute(CreateIndex(idx, if_not_exists=True))
+    # substituído por ix_users_name_key_id (lower() do SQLite só dobra ASCII)
+    conn.execute(text("DROP INDEX IF EXISTS ix_users_name_lower_id"))
+    backfill_user_name_keys()
+    _ensure_color_uniqueness()
+    db.session.commit()
+
+def _canonical_registry_entities():
+    """Unifica grafias antigas de registry_entity (ex.: "Não FIFE")."""
+    for entity in REGISTRY_ENTITIES:
+        db.session.execute(
+            update(Cat).where(func.lower(Cat.registry_entity) == entity.lower(),
+                              Cat.registry_entity != entity)
+            .values(registry_entity=entity).execution_options(synchronize_session=False)
+        )
+
+@bp.cli.command("init-db")
 def init_db_command():
     """Inicializa o banco e cria admin padrão."""
-    db.create_all()
+    upgrade_schema()
+    init_search_index()
+    _canonical_registry_entities()
+    rebuild_cat_stats()
+    rebuild_identifiers()
     _ensure_default_admin()
+    db.session.commit()
     print("Banco inicializado.")
 
+@bp.cli.command("upgrade-db")
+def upgrade_db_command():
+    """Aplica colunas e índices novos a um banco existente."""
+    upgrade_schema()
+    _canonical_registry_entities()
+    rebuild_cat_stats()
+    rebuild_identifiers()
+    db.session.commit()
+    print("Banco atualizado.")
+
+@bp.cli.command("rebuild-stats")
+def rebuild_stats_command():
+    """Recalcula a tabela de estatísticas de gatos (cat_stats)."""
+    rebuild_cat_stats()
+    db.session.commit()
+    print("Estatísticas reconstruídas.")
+
+@bp.cli.command("rebuild-identifiers")
+def rebuild_identifiers_command():
+    """Recalcula microchip e registro normalizados (detecção de duplicatas)."""
+    n = rebuild_identifiers()
+    db.session.commit()
+    print(f"Identificadores normalizados de {n} gatos.")
+
+def sync_replica():
+    """Réplica improvisada para SQLite: copia o primário inteiro para o
+    arquivo da réplica com a API de backup (consistente, sem travar leitores
+    do primário). Em Postgres use a replicação do próprio banco."""
+    primary, replica = db.engines[None], db.engines.get("replica")
+    if replica is None or primary.dialect.name != "sqlite" or replica.dialect.name != "sqlite":
+        raise RuntimeError("sync_replica só se aplica a primário e réplica SQLite")
+    src = sqlite3.connect(primary.url.database)
+    dst = sqlite3.connect(replica.url.database, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+@bp.cli.command("sync-replica")
+@click.option("--interval", type=float, default=0, help="repete a cada N segundos")
+def sync_replica_command(interval):
+    """Copia o banco primário para a réplica SQLite (DATABASE_REPLICA_URL)."""
+    while True:
+        sync_replica()
+        print(f"[replica] sincronizada em {dt.datetime.now().isoformat(timespec='seconds')}")
+        if not interval:
+            break
+        time.sleep(interval)
+
+@bp.cli.command("worker")
+@click.option("--poll", type=float, default=1.0, help="intervalo de consulta da fila (s)")
+@click.option("--drain", is_flag=True, help="processa o que houver na fila e termina")
+def worker_command(poll, drain):
+    """Processa a fila de jobs (importações, exclusões em lote)."""
+    stop = {"flag": False}
+    def request_stop(signum, frame):
+        stop["flag"] = True  # termina o job atual e sai
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    logging.basicConfig(level=logging.INFO)
+    print("[worker] aguardando jobs...")
+    n = work(current_app._get_current_object(), poll=poll, drain=drain,
+             should_stop=lambda: stop["flag"])
+    print(f"[worker] {n} jobs processados.")
+
+@bp.cli.command("rebuild-search")
+def rebuild_search_command():
+    """Reconstrói o índice de busca de gatos."""
+    init_search_index()
+    print("Índice de busca reconstruído.")
+
+# ------------------------------------------------------------------------------
+# Fábrica da aplicação e aquecimento (startup)
+# ------------------------------------------------------------------------------
+# A importação só define modelos, o blueprint e funções; create_app() monta o
+# Flask: configuração (ambiente + `config`), módulos opcionais, cache de
+# bytecode do Jinja, engines (db.init_app, PRAGMAs do SQLite) e o blueprint.
+# Com warm=True (ou WARM_UP=1) também aquece os caches que cada worker
+# montaria no primeiro request. Com o gunicorn em modo preload, o aquecimento
+# roda uma vez no processo mestre e os workers herdam (copy-on-write) os
+# templates compilados, os mappers configurados e os hashes dos estáticos:
+#
+#   gunicorn --preload -w 4 "app:create_app(warm=True)"
+#
+# Esquema e admin padrão não são tocados aqui: `flask init-db`/`upgrade-db`.
+WARM_UP = os.getenv("WARM_UP", "0") == "1"
+startup_logger = logging.getLogger("catclube.startup")
+
+def warm_up(app):
+    """Compila todos os templates, configura os mappers do ORM, calcula os
+    hashes dos estáticos e carrega os dados de referência. Devolve os
+    tempos (ms) de cada etapa."""
+    from sqlalchemy.orm import configure_mappers
+
+    timings = {}
+    t0 = time.perf_counter()
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    timings["templates_ms"] = (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    configure_mappers()
+    timings["mappers_ms"] = (time.perf_counter() - t0) * 1000
+
+    with app.app_context():
+        t0 = time.perf_counter()
+        for root, _, files in os.walk(app.static_folder):
+            for fname in files:
+                rel = os.path.relpath(os.path.join(root, fname), app.static_folder)
+                _static_hash(rel.replace(os.sep, "/"))
+        timings["static_ms"] = (time.perf_counter() - t0) * 1000
+
+        t0 = time.perf_counter()
+        try:
+            ref_breeds()
+        except OperationalError as e:  # banco ainda sem esquema: `flask init-db`
+            startup_logger.warning("warm-up sem dados de referência: %s", e)
+        db.session.remove()
+        # conexões abertas aqui não podem atravessar o fork dos workers
+        for engine in db.engines.values():
+            engine.dispose()
+        timings["reference_ms"] = (time.perf_counter() - t0) * 1000
+    return timings
+
+def create_app(config=None, warm=None):
+    """Cria e devolve uma aplicação nova.
+
+    `config` sobrescreve os padrões do ambiente (_default_config), inclusive
+    SQLALCHEMY_DATABASE_URI e SQLALCHEMY_BINDS. `warm` (padrão: variável
+    WARM_UP=1) executa warm_up().
+    """
+    t0 = time.perf_counter()
+    _load_optional_modules()
+    app = Flask(__name__)
+    app.config.update(_default_config())
+    app.config.update(config or {})
+    app.config.setdefault(
+        "SQLALCHEMY_ENGINE_OPTIONS", _engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
+    )
+    app.jinja_env.bytecode_cache = _jinja_bytecode_cache(app.config["JINJA_CACHE_DIR"])
+
+    db.init_app(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == "sqlite":
+                event.listen(engine, "connect", _sqlite_pragmas)
+    app.register_blueprint(bp)
+
+    timings = {"create_app_ms": (time.perf_counter() - t0) * 1000}
+    if WARM_UP if warm is None else warm:
+        timings.update(warm_up(app))
+    startup_logger.info("startup %s", json.dumps({k: round(v, 1) for k, v in timings.items()}))
+    return app
+
+# `app` do módulo: `flask --app app`, `gunicorn app:app` e scripts que fazem
+# `import app` continuam funcionando.
+app = create_app()
+
 # Execução local
 if __name__ == "__main__":
-    with app.app_context():
-        db.create_all()
-        _ensure_default_admin()
+    # esquema e admin padrão: `flask init-db` (ou `flask upgrade-db`)
     app.run(host="0.0.0.0", port=5000, debug=True)
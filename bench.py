@@ -0,0 +1,653 @@
+# bench.py — benchmark reprodutível das rotas do CatClube
+#
+# Gera dados sintéticos num banco SQLite descartável (raças FIFe de seed.py,
+# cores, usuários e gatos), dispara as rotas principais pelo test client do
+# Flask e reporta latência p50/p95/p99, requisições por segundo e número de
+# queries SQL por request. O resultado pode ser salvo em JSON e comparado
+# com uma execução anterior para detectar regressões.
+#
+# Uso:
+#   python bench.py --users 2000 --cats 100000 --out bench-base.json
+#   python bench.py --users 2000 --cats 100000 --compare bench-base.json
+#   python bench.py --routes login --flood 10000   # simula credential stuffing
+#   python bench.py --compression                   # bytes economizados e custo de CPU
+#   python bench.py --routes none --concurrency 8   # escritores e leitores em processos
+#
+# O repositório não tem suíte de testes: --flood e --concurrency servem de
+# verificação de regressão e saem com código 1 quando falham (tentativas de
+# login além da capacidade dos baldes; qualquer operação com erro, como
+# "database is locked"), assim como --compare quando há regressão de p95.
+#   python bench.py --routes none --read-models     # linhas/s: ORM completo x colunas projetadas
+#   python bench.py --routes none --startup         # import, create_app e primeiro request
+import os
+import io
+import sys
+import json
+import time
+import queue
+import random
+import argparse
+import tempfile
+import platform
+import subprocess
+import datetime as dt
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, BASE_DIR)
+
+from seed import FIFE_BREEDS  # noqa: E402
+
+BENCH_PASSWORD = "bench123"
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark das rotas do CatClube")
+    p.add_argument("--users", type=int, default=1000)
+    p.add_argument("--cats", type=int, default=20000)
+    p.add_argument("--colors-per-breed", type=int, default=40)
+    p.add_argument("--requests", type=int, default=50, help="requests por rota")
+    p.add_argument("--import-rows", type=int, default=5000, help="linhas do CSV de importação")
+    p.add_argument("--pedigree-generations", type=int, default=10,
+                   help="gerações da população sintética de pedigree")
+    p.add_argument("--pedigree-size", type=int, default=200, help="gatos por geração")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--db", help="arquivo SQLite (padrão: temporário)")
+    p.add_argument("--routes", help="lista de rotas separadas por vírgula (padrão: todas)")
+    p.add_argument("--out", help="salva o resultado em JSON")
+    p.add_argument("--compare", help="JSON de uma execução anterior")
+    p.add_argument("--threshold", type=float, default=1.2,
+                   help="razão de p95 considerada regressão (padrão 1.2)")
+    p.add_argument("--compression", action="store_true",
+                   help="mede tamanho e custo de CPU de gzip/brotli por rota")
+    p.add_argument("--concurrency", type=int, default=0,
+                   help="processos concorrentes (metade escreve, metade lê) no mesmo banco")
+    p.add_argument("--concurrency-seconds", type=float, default=10.0)
+    p.add_argument("--read-models", action="store_true",
+                   help="compara linhas/s das listas: ORM com joinedload x colunas projetadas")
+    p.add_argument("--read-models-rows", type=int, default=5000,
+                   help="linhas por consulta na comparação de --read-models")
+    p.add_argument("--startup", action="store_true",
+                   help="mede o boot em processos novos: sem cache, com bytecode do Jinja e com warm-up")
+    p.add_argument("--startup-runs", type=int, default=3, help="processos por modo em --startup")
+    p.add_argument("--flood", type=int, default=0,
+                   help="simula N tentativas de login de bots e confere o rate limit")
+    return p.parse_args(argv)
+
+
+# ------------------------------------------------------------------------------
+# Dados sintéticos
+# ------------------------------------------------------------------------------
+def seed_synthetic(catclube, args):
+    """Dados do `flask seed` (mesmo gerador, mesma semente) mais a população
+    fechada de pedigree usada pelos cenários de COI."""
+    db = catclube.db
+    catclube.seed_synthetic(
+        args.users, args.cats, seed=args.seed, colors_per_breed=args.colors_per_breed,
+        password=BENCH_PASSWORD, email_domain="bench.test",
+    )
+    rnd = random.Random(args.seed)
+    user_ids = [
+        uid for (uid,) in db.session.query(catclube.User.id)
+        .filter(catclube.User.email.like("%@bench.test")).order_by(catclube.User.id)
+    ]
+    breed_ids = [bid for (bid,) in db.session.query(catclube.Breed.id).order_by(catclube.Breed.id)]
+    seed_pedigree(catclube, args, rnd, user_ids, breed_ids, dt.datetime(2022, 1, 1))
+    catclube.rebuild_cat_stats()
+    db.session.commit()
+    catclube.init_search_index()
+
+
+def seed_pedigree(catclube, args, rnd, user_ids, breed_ids, base):
+    """População fechada de N gerações: cada filhote tem pai e mãe sorteados
+    na geração anterior, o que gera consanguinidade crescente."""
+    db, Cat = catclube.db, catclube.Cat
+    prev = None
+    for gen in range(args.pedigree_generations):
+        rows = []
+        for i in range(args.pedigree_size):
+            sex = "Macho" if i % 2 == 0 else "Fêmea"
+            row = {
+                "owner_id": rnd.choice(user_ids),
+                "breed_id": breed_ids[0],
+                "name": f"Ped G{gen:02d} {i:05d}",
+                "sex": sex,
+                "status": "approved",
+                "created_at": base + dt.timedelta(days=365 * gen // 3 + rnd.randrange(120)),
+            }
+            if prev:
+                row["sire_id"] = rnd.choice(prev["Macho"])
+                row["dam_id"] = rnd.choice(prev["Fêmea"])
+            rows.append(row)
+        db.session.execute(Cat.__table__.insert(), rows)
+        prev = {"Macho": [], "Fêmea": []}
+        for cid, sex in db.session.query(Cat.id, Cat.sex).filter(Cat.name.like(f"Ped G{gen:02d} %")):
+            prev[sex].append(cid)
+
+
+# ------------------------------------------------------------------------------
+# Medição
+# ------------------------------------------------------------------------------
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[k]
+
+
+def measure(fn, n, query_counter, warmup=2):
+    for _ in range(warmup):
+        fn()
+    latencies, queries, statuses = [], [], {}
+    for _ in range(n):
+        query_counter[0] = 0
+        t0 = time.perf_counter()
+        resp = fn()
+        latencies.append((time.perf_counter() - t0) * 1000)
+        queries.append(query_counter[0])
+        statuses[str(resp.status_code)] = statuses.get(str(resp.status_code), 0) + 1
+    latencies.sort()
+    total_s = sum(latencies) / 1000
+    return {
+        "n": n,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(sum(latencies) / n, 3),
+        "rps": round(n / total_s, 1) if total_s else None,
+        "queries_per_req": round(sum(queries) / n, 2),
+        "status": statuses,
+    }
+
+
+def build_scenarios(catclube, args):
+    app, db = catclube.app, catclube.db
+    rnd = random.Random(args.seed + 1)
+
+    admin = app.test_client()
+    admin.post("/login", data={"email": "admin@catclube.test", "password": "admin123"})
+
+    with app.app_context():
+        _, owner_email = (
+            db.session.query(catclube.User.id, catclube.User.email)
+            .join(catclube.Cat, catclube.Cat.owner_id == catclube.User.id)
+            .group_by(catclube.User.id)
+            .order_by(db.func.count(catclube.Cat.id).desc())
+            .first()
+        )
+        breed_ids = [bid for (bid,) in db.session.query(catclube.Breed.id)]
+        breed_colors = {}
+        for cid, bid in db.session.query(catclube.Color.id, catclube.Color.breed_id):
+            breed_colors.setdefault(bid, []).append(cid)
+        samples = db.session.query(catclube.Cat.microchip, catclube.Cat.name).limit(200).all()
+        total = db.session.query(catclube.Cat).count()
+        deep_page = max(1, int((total // 20) * 0.9))
+        deep_row = (
+            db.session.query(catclube.Cat.created_at, catclube.Cat.id)
+            .order_by(catclube.Cat.created_at.desc(), catclube.Cat.id.desc())
+            .offset(deep_page * 20 - 1).first()
+        )
+    with app.test_request_context():
+        deep_cursor = catclube._encode_cursor("next", list(deep_row), deep_page + 1) if deep_row else ""
+    search_terms = [m[3:9] for m, _ in samples] + [n[-4:] for _, n in samples]
+    with app.app_context():
+        ped = {"Macho": [], "Fêmea": []}
+        last = f"Ped G{args.pedigree_generations - 1:02d} %"
+        for cid, sex in db.session.query(catclube.Cat.id, catclube.Cat.sex).filter(catclube.Cat.name.like(last)):
+            ped[sex].append(cid)
+        founders = [cid for (cid,) in db.session.query(catclube.Cat.id)
+                    .filter(catclube.Cat.name.like("Ped G00 %")).limit(50)]
+
+    owner = app.test_client()
+    owner.post("/login", data={"email": owner_email, "password": BENCH_PASSWORD})
+    anon = app.test_client()
+    login_seq = iter(range(1, 1 << 30))
+    def login():
+        # um IP por request, para medir o login e não o rate limit
+        n = next(login_seq)
+        return anon.post("/login", data={"email": owner_email, "password": BENCH_PASSWORD},
+                         environ_base={"REMOTE_ADDR": f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}"})
+
+    etags = {}
+    def colors_304():
+        bid = rnd.choice(breed_ids)
+        headers = {"If-None-Match": etags[bid]} if bid in etags else {}
+        resp = owner.get(f"/api/colors?breed_id={bid}", headers=headers)
+        if resp.headers.get("ETag"):
+            etags[bid] = resp.headers["ETag"]
+        return resp
+
+    csv_rows = ["breed,color,ems"] + [
+        f"{rnd.choice(FIFE_BREEDS)},Import {i:06d},IMP {i}" for i in range(args.import_rows)
+    ]
+    csv_bytes = "\n".join(csv_rows).encode("utf-8")
+
+    def colors_import():
+        # upload + enfileiramento, e o worker drenando a fila logo em seguida
+        resp = admin.post("/admin/colors/import",
+                          data={"file": (io.BytesIO(csv_bytes), "cores.csv")},
+                          content_type="multipart/form-data")
+        catclube.work(catclube.app, "bench", drain=True)
+        return resp
+
+    def litter():
+        bid = rnd.choice(list(breed_colors))
+        return owner.post("/api/litters", json={
+            "breed_id": bid,
+            "dob": "2024-01-15",
+            "sire_id": rnd.choice(ped["Macho"]),
+            "dam_id": rnd.choice(ped["Fêmea"]),
+            "kittens": [
+                {"name": f"Filhote {rnd.randrange(10**6)}", "sex": rnd.choice(("Macho", "Fêmea")),
+                 "color_id": rnd.choice(breed_colors[bid])}
+                for _ in range(rnd.randint(4, 8))
+            ],
+        })
+
+    return {
+        "login": login,
+        "login_flood": lambda: anon.post(
+            "/login", data={"email": f"bot{rnd.randrange(10**6)}@x.test", "password": "x"},
+            environ_base={"REMOTE_ADDR": "203.0.113.7"}),
+        "dashboard": lambda: owner.get("/dashboard"),
+        "api_colors": lambda: owner.get(f"/api/colors?breed_id={rnd.choice(breed_ids)}"),
+        "api_colors_304": colors_304,
+        "api_colors_bulk": lambda: owner.get(
+            "/api/colors?breed_ids=" + ",".join(map(str, rnd.sample(breed_ids, 3)))),
+        "admin_home": lambda: admin.get("/admin/home"),
+        "admin_cats": lambda: admin.get("/admin/cats"),
+        "admin_cats_search": lambda: admin.get(f"/admin/cats?q={rnd.choice(search_terms)}"),
+        "admin_cats_deep_offset": lambda: admin.get(f"/admin/cats?page={deep_page}"),
+        "admin_cats_deep_cursor": lambda: admin.get(f"/admin/cats?page={deep_page + 1}&cursor={deep_cursor}"),
+        "admin_users": lambda: admin.get("/admin/users"),
+        "admin_stats": lambda: admin.get("/admin/stats"),
+        "pedigree": lambda: owner.get(
+            f"/api/cats/{rnd.choice(ped['Macho'] + ped['Fêmea'])}/pedigree?generations={args.pedigree_generations}"),
+        "pedigree_descendants": lambda: owner.get(
+            f"/api/cats/{rnd.choice(founders)}/pedigree?direction=down&generations=3"),
+        "coi_litter": lambda: owner.get(
+            f"/api/coi?sire_id={rnd.choice(ped['Macho'])}&dam_id={rnd.choice(ped['Fêmea'])}"
+            f"&generations={args.pedigree_generations}"),
+        "litter": litter,
+        "colors_import": colors_import,
+    }
+
+
+def simulate_flood(catclube, attempts, seed):
+    """Dispara `attempts` logins falsos e conta quantos chegaram ao hash.
+
+    Metade vem de um único IP com emails variados (stuffing), metade de IPs
+    variados contra o mesmo email (spraying). Com o rate limit ativo, só a
+    capacidade inicial de cada balde deve chegar a verify_password. O store
+    em memória roda com poucas chaves, para que os emails distintos forcem
+    despejos: eles não podem zerar os baldes do IP e do email atacados.
+    """
+    rnd = random.Random(seed)
+    client = catclube.app.test_client()
+    store = catclube.rate_store
+    saved_max_keys = getattr(store, "max_keys", None)
+    if saved_max_keys is not None:
+        store.max_keys = max(16, attempts // 20)
+    verified = [0]
+    original = catclube.verify_password
+    def counting_verify(*a, **kw):
+        verified[0] += 1
+        return original(*a, **kw)
+    catclube.verify_password = counting_verify
+    statuses = {}
+    t0 = time.perf_counter()
+    try:
+        for i in range(attempts):
+            if i % 2:
+                email, ip = f"bot{rnd.randrange(10**6)}@x.test", "203.0.113.7"
+            else:
+                email, ip = "admin@catclube.test", f"198.51.{i >> 8 & 255}.{i & 255}"
+            resp = client.post("/login", data={"email": email, "password": "errada"},
+                               environ_base={"REMOTE_ADDR": ip})
+            statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+    finally:
+        catclube.verify_password = original
+        if saved_max_keys is not None:
+            store.max_keys = saved_max_keys
+    elapsed = time.perf_counter() - t0
+    ip_cap, _ = catclube._parse_rate(catclube.RATE_LIMITS["login_ip"])
+    email_cap, _ = catclube._parse_rate(catclube.RATE_LIMITS["login_email"])
+    budget = int(ip_cap + email_cap)
+    print(f"[bench] flood: {attempts} tentativas em {elapsed:.1f}s, "
+          f"{verified[0]} verificações de hash (limite {budget}), status {statuses}")
+    return verified[0] <= budget
+
+
+def compression_report(catclube, scenarios, names, repeat=20):
+    """Tamanho da resposta sem compressão e com cada codificação, e o tempo
+    de CPU gasto para comprimir (process_time, média de `repeat` rodadas)."""
+    encodings = catclube._compression_encodings()
+    report = {}
+    print(f"\n{'rota':<26}{'bytes':>10}" + "".join(f"{e:>10}{e + ' ms':>10}" for e in encodings))
+    for name in names:
+        resp = scenarios[name]()
+        if resp.status_code != 200 or resp.headers.get("Content-Encoding"):
+            continue
+        raw = resp.get_data()
+        row = {"bytes": len(raw)}
+        line = f"{name:<26}{len(raw):>10}"
+        for enc in encodings:
+            t0 = time.process_time()
+            for _ in range(repeat):
+                out = catclube.compress_body(raw, enc)
+            cpu_ms = (time.process_time() - t0) * 1000 / repeat
+            row[enc] = {"bytes": len(out), "cpu_ms": round(cpu_ms, 3)}
+            line += f"{len(out):>10}{cpu_ms:>10.3f}"
+        report[name] = row
+        print(line)
+    total = sum(r["bytes"] for r in report.values())
+    for enc in encodings:
+        packed = sum(r[enc]["bytes"] for r in report.values())
+        if total:
+            print(f"[bench] {enc}: {total - packed} de {total} bytes economizados "
+                  f"({100 * (total - packed) / total:.1f}%)")
+    return report
+
+
+def read_model_report(catclube, rows, repeat=5):
+    """Linhas por segundo das três listas (dashboard, pendentes, admin de
+    gatos): a forma antiga (Cat + joinedload, copiado para dicts) contra
+    cat_list_query. Cada rodada usa uma sessão limpa, como um request."""
+    from sqlalchemy.orm import joinedload
+    db, Cat, User = catclube.db, catclube.Cat, catclube.User
+
+    def legacy(filters, with_owner):
+        options = [joinedload(Cat.breed), joinedload(Cat.color)]
+        if with_owner:
+            options.append(joinedload(Cat.owner))
+        cats = (db.session.query(Cat).options(*options).filter(*filters)
+                .order_by(Cat.created_at.desc()).limit(rows).all())
+        return [{
+            "id": c.id,
+            "name": c.name,
+            "owner_name": c.owner.name if with_owner and c.owner else "-",
+            "breed_name": c.breed.name if c.breed else None,
+            "color_name": c.color.name if c.color else None,
+            "ems_code": c.color.ems_code if c.color else None,
+            "dob": c.dob.isoformat() if c.dob else None,
+            "status": c.status,
+        } for c in cats]
+
+    def projected(filters, with_owner):
+        return (catclube.cat_list_query(with_owner).filter(*filters)
+                .order_by(Cat.created_at.desc()).limit(rows).all())
+
+    report = {}
+    with catclube.app.app_context():
+        busiest = (db.session.query(Cat.owner_id).group_by(Cat.owner_id)
+                   .order_by(catclube.func.count().desc()).limit(1).scalar())
+        views = {
+            "dashboard": ([Cat.owner_id == busiest], False),
+            "admin_home": ([Cat.status == "pending"], True),
+            "admin_cats": ([], True),
+        }
+        print(f"\n{'lista':<14}{'linhas':>8}{'ORM linhas/s':>16}{'proj. linhas/s':>16}{'ganho':>8}")
+        for view, (filters, with_owner) in views.items():
+            row = {}
+            for label, fn in (("orm", legacy), ("projected", projected)):
+                fn(filters, with_owner)  # aquece cache de páginas do SQLite
+                db.session.remove()
+                t0 = time.perf_counter()
+                for _ in range(repeat):
+                    n = len(fn(filters, with_owner))
+                    db.session.remove()
+                elapsed = (time.perf_counter() - t0) / repeat
+                row[label] = {"rows": n, "rows_per_s": round(n / elapsed) if elapsed else None}
+            speedup = (row["projected"]["rows_per_s"] or 0) / max(1, row["orm"]["rows_per_s"] or 0)
+            row["speedup"] = round(speedup, 2)
+            report[view] = row
+            print(f"{view:<14}{row['orm']['rows']:>8}{row['orm']['rows_per_s']:>16}"
+                  f"{row['projected']['rows_per_s']:>16}{speedup:>7.1f}x")
+    return report
+
+
+# Roda num interpretador novo: o tempo de import só é real sem módulos em cache.
+_STARTUP_PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import app as catclube  # inclui o `app` do módulo (create_app sem warm-up)
+t1 = time.perf_counter()
+application = catclube.create_app(warm=sys.argv[1] == "1")
+t2 = time.perf_counter()
+client = application.test_client()
+client.post("/login", data={"email": "admin@catclube.test", "password": "admin123"})
+t3 = time.perf_counter()
+first = {}
+for url in ("/admin/cats", "/admin/stats", "/dashboard"):
+    t = time.perf_counter()
+    client.get(url)
+    first[url] = (time.perf_counter() - t) * 1000
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "create_app_ms": (t2 - t1) * 1000,
+                  "login_ms": (t3 - t2) * 1000, "first_requests_ms": sum(first.values())}))
+"""
+
+
+def startup_report(db_path, runs):
+    """Boot a frio em subprocessos, por modo: sem cache de bytecode do Jinja,
+    com o cache já populado e com o cache + warm-up (create_app(warm=True)).
+    Reporta a mediana de cada etapa."""
+    cache_dir = tempfile.mkdtemp(prefix="catclube-jinja-")
+    modes = (
+        ("sem cache", "", "0"),
+        ("bytecode", cache_dir, "0"),
+        ("bytecode+warm", cache_dir, "1"),
+    )
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}", HASH_WORKERS="0")
+    # popula o cache antes de medir o modo "bytecode"
+    subprocess.run([sys.executable, "-c", _STARTUP_PROBE, "1"], cwd=BASE_DIR, check=True,
+                   env=dict(env, JINJA_CACHE_DIR=cache_dir), stdout=subprocess.DEVNULL)
+    report = {}
+    keys = ("import_ms", "create_app_ms", "login_ms", "first_requests_ms")
+    print(f"\n{'modo':<16}{'import':>10}{'create_app':>13}{'login':>10}{'1º requests':>13}{'total':>10}")
+    for label, cache, warm in modes:
+        samples = []
+        for _ in range(runs):
+            out = subprocess.run([sys.executable, "-c", _STARTUP_PROBE, warm], cwd=BASE_DIR,
+                                 check=True, capture_output=True, text=True,
+                                 env=dict(env, JINJA_CACHE_DIR=cache)).stdout
+            samples.append(json.loads(out.strip().splitlines()[-1]))
+        row = {k: round(sorted(s[k] for s in samples)[len(samples) // 2], 1) for k in keys}
+        row["total_ms"] = round(sum(row[k] for k in keys), 1)
+        report[label] = row
+        print(f"{label:<16}{row['import_ms']:>10.1f}{row['create_app_ms']:>13.1f}"
+              f"{row['login_ms']:>10.1f}{row['first_requests_ms']:>13.1f}{row['total_ms']:>10.1f}")
+    return report
+
+
+def _concurrency_worker(db_path, role, seconds, seed, results):
+    """Processo filho: importa o app apontando para o mesmo arquivo e faz
+    cadastros (writer) ou listagens (reader) até o tempo acabar."""
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    # hash no próprio processo: um pool filho impediria este processo de terminar
+    os.environ["HASH_WORKERS"] = "0"
+    import app as catclube
+    # exceções sobem até aqui (em vez de virar 500) e a mensagem aparece nas amostras
+    catclube.app.config["PROPAGATE_EXCEPTIONS"] = True
+    rnd = random.Random(seed)
+    client = catclube.app.test_client()
+    client.post("/login", data={"email": "admin@catclube.test", "password": "admin123"})
+    with catclube.app.app_context():
+        breed_ids = [bid for (bid,) in catclube.db.session.query(catclube.Breed.id)]
+    ops = errors = 0
+    samples = []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            if role == "writer":
+                resp = client.post("/cats/new", data={
+                    "name": f"Concorrente {seed}-{ops}",
+                    "breed_id": rnd.choice(breed_ids),
+                    "registry_entity": "FIFE Brasil",
+                })
+                ok = resp.status_code == 302
+            else:
+                resp = client.get(rnd.choice(("/admin/cats", "/admin/users", "/admin/stats")))
+                ok = resp.status_code == 200
+        except Exception as e:  # noqa: BLE001 — qualquer falha conta como erro
+            ok, resp = False, e
+        ops += 1
+        if not ok:
+            errors += 1
+            if len(samples) < 3:
+                samples.append(str(getattr(resp, "status_code", resp))[:120])
+    results.put((role, ops, errors, samples))
+
+
+def concurrency_check(db_path, processes, seconds):
+    """Roda escritores e leitores em processos separados; devolve True se
+    nenhuma operação falhou (ex.: "database is locked")."""
+    import multiprocessing
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(target=_concurrency_worker,
+                    args=(db_path, "writer" if i % 2 == 0 else "reader", seconds, i, results))
+        for i in range(processes)
+    ]
+    for p in procs:
+        p.start()
+    totals = {}
+    for _ in procs:
+        try:
+            role, ops, errors, samples = results.get(timeout=seconds + 120)
+        except queue.Empty:  # processo morreu antes de reportar
+            role, ops, errors, samples = "perdido", 0, 1, ["sem resultado"]
+        t = totals.setdefault(role, [0, 0, []])
+        t[0] += ops
+        t[1] += errors
+        t[2].extend(samples)
+    for p in procs:
+        p.join()
+        if p.exitcode:
+            totals.setdefault("perdido", [0, 0, []])[1] += 1
+    for role, (ops, errors, samples) in sorted(totals.items()):
+        print(f"[bench] concorrência {role:<7} {ops:>7} operações  {ops / seconds:>8.1f} op/s  "
+              f"{errors} erros{'  ' + ', '.join(samples) if samples else ''}")
+    return all(t[1] == 0 for t in totals.values())
+
+
+def compare(current, previous, threshold):
+    regressions = []
+    print(f"\n{'rota':<26}{'p95 antes':>12}{'p95 agora':>12}{'razão':>8}")
+    for name, stats in current["routes"].items():
+        old = previous.get("routes", {}).get(name)
+        if not old or not old.get("p95_ms"):
+            continue
+        ratio = stats["p95_ms"] / old["p95_ms"]
+        flag = "  REGRESSÃO" if ratio > threshold else ""
+        print(f"{name:<26}{old['p95_ms']:>12.2f}{stats['p95_ms']:>12.2f}{ratio:>8.2f}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="catclube-bench-"), "bench.db")
+    fresh = not os.path.exists(db_path)
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    import app as catclube  # importado só depois de apontar para o banco do benchmark
+
+    from sqlalchemy import event
+    query_counter = [0]
+
+    with catclube.app.app_context():
+        @event.listens_for(catclube.db.engine, "before_cursor_execute")
+        def _count(*_):
+            query_counter[0] += 1
+
+        if fresh:
+            t0 = time.perf_counter()
+            catclube.upgrade_schema()
+            catclube._ensure_default_admin()
+            seed_synthetic(catclube, args)
+            print(f"[bench] dados gerados em {time.perf_counter() - t0:.1f}s ({db_path})")
+
+    scenarios = build_scenarios(catclube, args)
+    wanted = set(args.routes.split(",")) if args.routes else None
+    results = {}
+    for name, fn in scenarios.items():
+        if wanted and name not in wanted:
+            continue
+        n = max(3, args.requests // 10) if name == "colors_import" else args.requests
+        results[name] = measure(fn, n, query_counter)
+        r = results[name]
+        print(f"[bench] {name:<24} p50 {r['p50_ms']:>8.2f}ms  p95 {r['p95_ms']:>8.2f}ms  "
+              f"p99 {r['p99_ms']:>8.2f}ms  {r['rps'] or 0:>8.1f} req/s  {r['queries_per_req']:>6.1f} q/req")
+
+    if args.concurrency:
+        with catclube.app.app_context():
+            catclube.db.engine.dispose()  # os filhos abrem suas próprias conexões
+        if not concurrency_check(db_path, args.concurrency, args.concurrency_seconds):
+            print("[bench] concorrência: houve operações com erro")
+            return 1
+
+    if args.flood and not simulate_flood(catclube, args.flood, args.seed):
+        print("[bench] flood: rate limit deixou passar tentativas demais")
+        return 1
+
+    compression = None
+    if args.compression:
+        pages = ("dashboard", "admin_home", "admin_cats", "admin_users", "admin_stats",
+                 "api_colors_bulk", "pedigree")
+        compression = compression_report(
+            catclube, scenarios, [n for n in pages if not wanted or n in wanted])
+
+    read_models = None
+    if args.read_models:
+        read_models = read_model_report(catclube, args.read_models_rows)
+
+    startup = None
+    if args.startup:
+        with catclube.app.app_context():
+            catclube.db.engine.dispose()
+        startup = startup_report(db_path, args.startup_runs)
+
+    output = {
+        "meta": {
+            "timestamp": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "users": args.users,
+            "cats": args.cats,
+            "colors_per_breed": args.colors_per_breed,
+            "requests": args.requests,
+            "seed": args.seed,
+        },
+        "routes": results,
+    }
+    if compression is not None:
+        output["compression"] = compression
+    if read_models is not None:
+        output["read_models"] = read_models
+    if startup is not None:
+        output["startup"] = startup
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(output, fh, indent=2, ensure_ascii=False)
+        print(f"[bench] resultado salvo em {args.out}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            regressions = compare(output, json.load(fh), args.threshold)
+        if regressions:
+            print(f"[bench] regressões: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
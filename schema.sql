@@ -3,6 +3,7 @@ PRAGMA foreign_keys = ON;
 CREATE TABLE IF NOT EXISTS users (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     name TEXT NOT NULL,
+    name_key TEXT,
     dob TEXT,
     sex TEXT,
     cpf TEXT,
@@ -34,6 +35,15 @@ CREATE TABLE IF NOT EXISTS colors (
     FOREIGN KEY (breed_id) REFERENCES breeds(id) ON DELETE CASCADE
 );
 
+CREATE TABLE IF NOT EXISTS litters (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner_id INTEGER NOT NULL,
+    dob TEXT,
+    size INTEGER NOT NULL,
+    created_at TEXT DEFAULT (datetime('now')),
+    FOREIGN KEY (owner_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
 CREATE TABLE IF NOT EXISTS cats (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     owner_id INTEGER NOT NULL,
@@ -44,6 +54,8 @@ CREATE TABLE IF NOT EXISTS cats (
     registry_number TEXT,
     registry_entity TEXT,
     microchip TEXT,
+    microchip_norm TEXT,
+    registry_norm TEXT,
     sex TEXT NOT NULL,
     neutered INTEGER NOT NULL DEFAULT 0,
     breeder_type TEXT,
@@ -57,6 +69,10 @@ CREATE TABLE IF NOT EXISTS cats (
     dam_breed_id INTEGER,
     dam_color_id INTEGER,
 
+    sire_id INTEGER,
+    dam_id INTEGER,
+    litter_id INTEGER,
+
     status TEXT NOT NULL DEFAULT 'pending',
     created_at TEXT DEFAULT (datetime('now')),
 
@@ -66,9 +82,25 @@ CREATE TABLE IF NOT EXISTS cats (
     FOREIGN KEY (sire_breed_id) REFERENCES breeds(id),
     FOREIGN KEY (sire_color_id) REFERENCES colors(id),
     FOREIGN KEY (dam_breed_id) REFERENCES breeds(id),
-    FOREIGN KEY (dam_color_id) REFERENCES colors(id)
+    FOREIGN KEY (dam_color_id) REFERENCES colors(id),
+    FOREIGN KEY (sire_id) REFERENCES cats(id),
+    FOREIGN KEY (dam_id) REFERENCES cats(id),
+    FOREIGN KEY (litter_id) REFERENCES litters(id)
 );
 
+CREATE INDEX IF NOT EXISTS ix_users_created_at_id ON users (created_at, id);
+CREATE INDEX IF NOT EXISTS ix_users_email_lower ON users (lower(email));
+CREATE INDEX IF NOT EXISTS ix_users_name_key_id ON users (name_key, id);
+CREATE INDEX IF NOT EXISTS ix_cats_status_created_at ON cats (status, created_at);
+CREATE INDEX IF NOT EXISTS ix_cats_owner_created_at ON cats (owner_id, created_at);
+CREATE INDEX IF NOT EXISTS ix_cats_breed_created_at ON cats (breed_id, created_at);
+CREATE INDEX IF NOT EXISTS ix_cats_created_at_id ON cats (created_at, id);
+CREATE INDEX IF NOT EXISTS ix_cats_sire_id ON cats (sire_id);
+CREATE INDEX IF NOT EXISTS ix_cats_dam_id ON cats (dam_id);
+CREATE INDEX IF NOT EXISTS ix_cats_litter_id ON cats (litter_id);
+CREATE INDEX IF NOT EXISTS ix_cats_microchip_norm ON cats (microchip_norm);
+CREATE INDEX IF NOT EXISTS ix_cats_registry_norm ON cats (registry_norm, registry_entity);
+
 CREATE TABLE IF NOT EXISTS password_resets (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     user_id INTEGER NOT NULL,
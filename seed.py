@@ -1,77 +1,78 @@
-def seed_all_fife_breeds():
-    # Lista oficial FIFe (out/2025): Categorias 1–4 (reconhecidas) + preliminares (BOM, LYO).
-    # Referência: https://fifeweb.org/cats/breeds/ (FIFe Breeds page)
-    category_1 = [
-        "Exotic",
-        "Persian",
-        "Ragdoll",
-        "Sacred Birman",
-        "Turkish Van",
-    ]
-    category_2 = [
-        "American Curl Longhair",
-        "American Curl Shorthair",
-        "LaPerm Longhair",
-        "LaPerm Shorthair",
-        "Maine Coon",
-        "Neva Masquerade",
-        "Norwegian Forest Cat",
-        "Siberian",
-        "Turkish Angora",
-    ]
-    category_3 = [
-        "Bengal",
-        "British Longhair",
-        "Burmilla",
-        "British Shorthair",
-        "Burmese",
-        "Chartreux",
-        "Cymric",
-        "European",
-        "Kurilean Bobtail Longhair",
-        "Kurilean Bobtail Shorthair",
-        "Korat",
-        "Manx",
-        "Egyptian Mau",
-        "Ocicat",
-        "Singapura",
-        "Snowshoe",
-        "Sokoke",
-        "Selkirk Rex Longhair",
-        "Selkirk Rex Shorthair",
-    ]
-    category_4 = [
-        "Abyssinian",
-        "Balinese",
-        "Cornish Rex",
-        "Devon Rex",
-        "Don Sphynx",
-        "German Rex",
-        "Japanese Bobtail Shorthair",
-        "Oriental Longhair",
-        "Oriental Shorthair",
-        "Peterbald",
-        "Russian Blue",
-        "Siamese",
-        "Somali",
-        "Sphynx",
-        "Thai",
-    ]
-    preliminary = [
-        "Bombay",  # BOM – preliminar (categoria 3)
-        "Lykoi",   # LYO – preliminar (categoria 4)
-    ]
+# Lista oficial FIFe (out/2025): Categorias 1–4 (reconhecidas) + preliminares (BOM, LYO).
+# Referência: https://fifeweb.org/cats/breeds/ (FIFe Breeds page)
+category_1 = [
+    "Exotic",
+    "Persian",
+    "Ragdoll",
+    "Sacred Birman",
+    "Turkish Van",
+]
+category_2 = [
+    "American Curl Longhair",
+    "American Curl Shorthair",
+    "LaPerm Longhair",
+    "LaPerm Shorthair",
+    "Maine Coon",
+    "Neva Masquerade",
+    "Norwegian Forest Cat",
+    "Siberian",
+    "Turkish Angora",
+]
+category_3 = [
+    "Bengal",
+    "British Longhair",
+    "Burmilla",
+    "British Shorthair",
+    "Burmese",
+    "Chartreux",
+    "Cymric",
+    "European",
+    "Kurilean Bobtail Longhair",
+    "Kurilean Bobtail Shorthair",
+    "Korat",
+    "Manx",
+    "Egyptian Mau",
+    "Ocicat",
+    "Singapura",
+    "Snowshoe",
+    "Sokoke",
+    "Selkirk Rex Longhair",
+    "Selkirk Rex Shorthair",
+]
+category_4 = [
+    "Abyssinian",
+    "Balinese",
+    "Cornish Rex",
+    "Devon Rex",
+    "Don Sphynx",
+    "German Rex",
+    "Japanese Bobtail Shorthair",
+    "Oriental Longhair",
+    "Oriental Shorthair",
+    "Peterbald",
+    "Russian Blue",
+    "Siamese",
+    "Somali",
+    "Sphynx",
+    "Thai",
+]
+preliminary = [
+    "Bombay",  # BOM – preliminar (categoria 3)
+    "Lykoi",   # LYO – preliminar (categoria 4)
+]
 
-    all_breeds = (
-        category_1
-        + category_2
-        + category_3
-        + category_4
-        + preliminary  # inclua preliminares se quiser permitir cadastro desde já
-    )
+FIFE_BREEDS = (
+    category_1
+    + category_2
+    + category_3
+    + category_4
+    + preliminary  # inclua preliminares se quiser permitir cadastro desde já
+)
 
+
+def seed_all_fife_breeds(get_db):
     with get_db() as db:
-        for name in all_breeds:
+        for name in FIFE_BREEDS:
             db.execute("INSERT OR IGNORE INTO breeds (name) VALUES (?)", (name,))
         db.commit()
 
@@ -83,13 +84,15 @@ def seed_all_fife_breeds():
 
 
 
+SAMPLE_COLORS = {
+    "Ragdoll": [("Seal Point","RAG n"),("Blue Point","RAG a"),("Chocolate Point","RAG b"),("Lilac Point","RAG c")],
+    "Persian": [("Black","PER n"),("Blue","PER a"),("Red","PER d"),("Chinchilla Silver","PER ns 12")],
+    "Maine Coon": [("Brown Classic Tabby","MCO n 22"),("Blue Mackerel Tabby","MCO a 23"),("Black","MCO n")],
+    "British Shorthair": [("Blue","BSH a"),("Black Silver Tabby","BSH ns 22"),("Golden Shaded","BSH ny 11")]
+}
+
 def seed_colors_examples(get_db):
-    samples = {
-        "Ragdoll": [("Seal Point","RAG n"),("Blue Point","RAG a"),("Chocolate Point","RAG b"),("Lilac Point","RAG c")],
-        "Persian": [("Black","PER n"),("Blue","PER a"),("Red","PER d"),("Chinchilla Silver","PER ns 12")],
-        "Maine Coon": [("Brown Classic Tabby","MCO n 22"),("Blue Mackerel Tabby","MCO a 23"),("Black","MCO n")],
-        "British Shorthair": [("Blue","BSH a"),("Black Silver Tabby","BSH ns 22"),("Golden Shaded","BSH ny 11")]
-    }
+    samples = SAMPLE_COLORS
     with get_db() as db:
         rows = db.execute("SELECT id, name FROM breeds").fetchall()
         bid = {r["name"]: r["id"] for r in rows}
@@ -106,9 +109,9 @@ def seed_admin(get_db):
         if not admin:
             from werkzeug.security import generate_password_hash
             db.execute("""
-                INSERT INTO users (name, email, password_hash, is_admin)
-                VALUES (?, ?, ?, 1)
-            """, ("Admin Demo", "admin@catclube.test", generate_password_hash("admin123")))
+                INSERT INTO users (name, name_key, email, password_hash, is_admin)
+                VALUES (?, ?, ?, ?, 1)
+            """, ("Admin Demo", "admin demo", "admin@catclube.test", generate_password_hash("admin123")))
             db.commit()
 
 def seed(get_db):
@@ -116,4 +119,27 @@ def seed(get_db):
     seed_colors_examples(get_db)
     seed_admin(get_db)
 
-seed(get_db)
+if __name__ == "__main__":
+    # Uso: python seed.py  (mesmo banco do app: DATABASE_URL ou catclube.db).
+    # Para dados sintéticos em volume, use `flask seed --users N --cats M`.
+    import sqlite3
+    from contextlib import contextmanager
+    from app import app, db, upgrade_schema
+
+    with app.app_context():
+        upgrade_schema()
+        if db.engine.url.get_backend_name() != "sqlite":
+            raise SystemExit("seed.py grava direto no SQLite; em outros bancos use `flask seed`.")
+        db_file = db.engine.url.database
+
+    @contextmanager
+    def get_db():
+        conn = sqlite3.connect(db_file)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    seed(get_db)
+    print("Seed concluído.")
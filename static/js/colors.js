@@ -0,0 +1,49 @@
+// Cores por raça: cache no navegador + /api/colors (ETag/304 no servidor).
+const colorsUrl = document.currentScript.dataset.colorsUrl;
+const colorCache = {};
+function fetchColors(breedIds) {
+  const missing = breedIds.filter(id => id && !(id in colorCache));
+  if (!missing.length) return Promise.resolve();
+  return fetch(colorsUrl + '?breed_ids=' + missing.join(','))
+    .then(r => r.json())
+    .then(data => Object.assign(colorCache, data));
+}
+function renderColors(colorSelectId, emsId, colors) {
+  const select = document.getElementById(colorSelectId);
+  const ems = document.getElementById(emsId);
+  const selected = select.value || select.dataset.selected || '';
+  select.innerHTML = '';
+  select.add(new Option(colors.length ? 'Selecione...' : 'Nenhuma cor cadastrada', ''));
+  colors.forEach(c => {
+    const opt = new Option(c.name + ' (' + c.ems_code + ')', c.id);
+    opt.dataset.ems = c.ems_code;
+    select.add(opt);
+  });
+  select.value = selected;
+  const syncEms = () => {
+    const opt = select.selectedOptions[0];
+    if (ems) ems.textContent = (opt && opt.dataset.ems) || '';
+  };
+  select.onchange = syncEms;
+  syncEms();
+}
+function loadColors(breedSelectId, colorSelectId, emsId) {
+  const breedId = document.getElementById(breedSelectId).value;
+  if (!breedId) { renderColors(colorSelectId, emsId, []); return; }
+  fetchColors([breedId]).then(() => renderColors(colorSelectId, emsId, colorCache[breedId] || []));
+}
+// Carrega de uma vez as cores de todas as raças já selecionadas no formulário.
+function preloadColors(groups) {
+  const ids = groups.map(g => document.getElementById(g[0]).value);
+  fetchColors(ids).then(() => groups.forEach((g, i) => {
+    if (ids[i]) renderColors(g[1], g[2], colorCache[ids[i]] || []);
+  }));
+}
+// Ninhada: a raça comum alimenta o select de cor de cada filhote (uma ida à API).
+function loadLitterColors(breedSelectId, colorSelectClass) {
+  const breedId = document.getElementById(breedSelectId).value;
+  const selects = Array.from(document.getElementsByClassName(colorSelectClass));
+  const render = colors => selects.forEach(s => renderColors(s.id, null, colors));
+  if (!breedId) { render([]); return; }
+  fetchColors([breedId]).then(() => render(colorCache[breedId] || []));
+}
@@ -0,0 +1,21 @@
+// Acompanha um job em andamento: consulta /admin/jobs/<id> até o job
+// terminar e então recarrega a página para exibir o resultado.
+(function () {
+  const box = document.getElementById('job_status');
+  if (!box) return;
+  const url = box.dataset.jobUrl;
+  const field = name => box.querySelector('[data-job-field="' + name + '"]');
+
+  function poll() {
+    fetch(url, { headers: { Accept: 'application/json' } })
+      .then(r => r.json())
+      .then(job => {
+        field('status').textContent = job.status;
+        field('error').textContent = job.error || '';
+        if (job.total) field('bar').style.width = Math.round(100 * job.progress / job.total) + '%';
+        if (job.status === 'done') window.location.reload();
+        else if (job.status !== 'failed') setTimeout(poll, 1000);
+      });
+  }
+  setTimeout(poll, 1000);
+})();
@@ -0,0 +1,42 @@
+// Busca incremental de donos: consulta /api/users/lookup enquanto o admin
+// digita e guarda o id escolhido no campo oculto owner_id.
+(function () {
+  const input = document.getElementById('owner_search');
+  const hidden = document.getElementById('owner_id');
+  const list = document.getElementById('owner_options');
+  if (!input || !hidden || !list) return;
+  const url = input.dataset.lookupUrl;
+  const byLabel = {};
+  let timer = null;
+  let seq = 0;
+
+  function label(u) { return u.name + ' <' + u.email + '>'; }
+
+  function search() {
+    const q = input.value.trim();
+    if (q.length < 2) return;
+    const mine = ++seq;
+    fetch(url + '?q=' + encodeURIComponent(q))
+      .then(r => r.json())
+      .then(data => {
+        if (mine !== seq) return;  // resposta de uma busca antiga
+        list.innerHTML = '';
+        data.items.forEach(u => {
+          byLabel[label(u)] = u;
+          list.appendChild(new Option(label(u)));
+        });
+      });
+  }
+
+  input.addEventListener('input', () => {
+    const picked = byLabel[input.value];
+    if (picked) {
+      hidden.value = picked.id;
+      input.value = picked.name;
+      return;
+    }
+    if (!input.value.trim()) hidden.value = '';
+    clearTimeout(timer);
+    timer = setTimeout(search, 200);
+  });
+})();